@@ -0,0 +1,98 @@
+"""Per page cost of pairing benefit query columns with rows
+
+Compares the DataFrame round trip used before with
+CostManager._combine_rows_and_columns_from_results on synthetic pages of the
+usage query API, and times the whole _make_benefit_cost_data transform.
+
+    PYTHONPATH=src python benchmark/benefit_rows.py --rows 5000
+"""
+
+import argparse
+import random
+import timeit
+from datetime import datetime
+
+import pandas as pd
+
+from cloudforet.cost_analysis.manager.cost_manager import CostManager
+
+END = datetime(2024, 1, 31)
+
+COLUMNS = [
+    "PricingModel",
+    "BenefitId",
+    "BenefitName",
+    "ReservationId",
+    "ReservationName",
+    "ChargeType",
+    "SubscriptionId",
+    "CustomerName",
+    "CustomerTenantId",
+    "DepartmentName",
+    "EnrollmentAccountName",
+    "ServiceFamily",
+    "ConsumedService",
+    "MeterCategory",
+    "TenantId",
+    "BillingProfileId",
+    "InvoiceSectionId",
+    "ResourceLocation",
+    "UsageDate",
+    "Cost",
+    "UsageQuantity",
+    "Currency",
+]
+
+
+def make_page(rows: int) -> dict:
+    random.seed(1)
+    return {
+        "properties": {
+            "columns": [{"name": name, "type": "String"} for name in COLUMNS],
+            "rows": [
+                [f"{name}-{i % 7}" for name in COLUMNS[:18]]
+                + [20240101 + i % 28, random.random(), random.random(), "USD"]
+                for i in range(rows)
+            ],
+        }
+    }
+
+
+def combine_with_dataframe(rows: list, columns: list) -> list:
+    _columns = [column.get("name") for column in columns]
+    return pd.DataFrame(data=rows, columns=_columns).to_dict(orient="records")
+
+
+def combine_with_zip(rows: list, columns: list) -> list:
+    return list(CostManager._combine_rows_and_columns_from_results(rows, columns))
+
+
+def measure(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    page = make_page(args.rows)
+    rows, columns = page["properties"]["rows"], page["properties"]["columns"]
+    cost_manager = CostManager._make_transform_manager()
+
+    dataframe_time = measure(lambda: combine_with_dataframe(rows, columns), args.number)
+    zip_time = measure(lambda: combine_with_zip(rows, columns), args.number)
+    transform_time = measure(
+        lambda: cost_manager._make_benefit_cost_data(page, END, {}, "bt"),
+        args.number,
+    )
+
+    print(f"rows per page: {args.rows}")
+    print(f"DataFrame + to_dict: {dataframe_time:.1f} ms/page")
+    print(f"zip over the rows:   {zip_time:.1f} ms/page")
+    print(f"benefit transform:   {transform_time:.1f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Memory held by transformed cost rows as records and as dicts
+
+Builds synthetic pay-as-you-go rows with CostManager._make_cost_data and
+measures with tracemalloc the memory they hold as CostRecord tuples and as
+the dicts that were kept before the records (CostRecord.to_dict).
+
+    PYTHONPATH=src python benchmark/cost_records.py --rows 100000
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+from cloudforet.cost_analysis.manager.cost_manager import CostManager
+from cloudforet.cost_analysis.model import (
+    CostRecord,
+    CostDataRecord,
+    AdditionalInfoRecord,
+)
+
+OPTIONS = {"cost_metric": "ActualCost"}
+END = datetime(2024, 1, 31)
+
+
+def make_report(rows: int) -> pd.DataFrame:
+    random.seed(1)
+    return pd.DataFrame(
+        {
+            "date": ["01/%02d/2024" % (i % 28 + 1) for i in range(rows)],
+            "costinbillingcurrency": [random.random() for _ in range(rows)],
+            "paygcostinbillingcurrency": [random.random() for _ in range(rows)],
+            "quantity": [random.random() for _ in range(rows)],
+            "metercategory": ["Virtual Machines"] * rows,
+            "metername": [f"D{i % 7} v3" for i in range(rows)],
+            "metersubcategory": ["Dv3"] * rows,
+            "meterid": [f"m{i % 50}" for i in range(rows)],
+            "resourcelocation": ["EU West"] * rows,
+            "resourcegroup": [f"rg{i % 20}" for i in range(rows)],
+            "subscriptionid": [f"s{i % 10}" for i in range(rows)],
+            "subscriptionname": [f"Sub {i % 10}" for i in range(rows)],
+            "chargetype": ["Usage"] * rows,
+            "pricingmodel": ["OnDemand"] * rows,
+            "productname": ["Virtual Machines Dv3"] * rows,
+            "productid": [f"p{i % 50}" for i in range(rows)],
+            "consumedservice": ["Microsoft.Compute"] * rows,
+            "servicefamily": ["Compute"] * rows,
+            "unitofmeasure": ["1 Hour"] * rows,
+            "tags": ['"env": "prod"'] * rows,
+            "billingcurrency": ["USD"] * rows,
+        }
+    )
+
+
+def make_cost_data(report: pd.DataFrame) -> list:
+    cost_manager = CostManager._make_transform_manager()
+    return cost_manager._make_cost_data(
+        report.copy(), END, OPTIONS, tenant_id="t1", billing_tenant_id="bt"
+    )
+
+
+def make_record(cost_data: dict) -> CostRecord:
+    cost_data = dict(cost_data)
+    cost_data["data"] = CostDataRecord(cost_data["data"])
+    cost_data["additional_info"] = AdditionalInfoRecord(cost_data["additional_info"])
+    return CostRecord(cost_data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    report = make_report(args.rows)
+    per_rows = 100000 / args.rows
+
+    started_at = time.perf_counter()
+    records = make_cost_data(report)
+    build_time = time.perf_counter() - started_at
+
+    dicts = [record.to_dict() for record in records]
+    started_at = time.perf_counter()
+    [make_record(cost_data) for cost_data in dicts]
+    record_time = time.perf_counter() - started_at
+    del records, dicts
+    gc.collect()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    records = make_cost_data(report)
+    gc.collect()
+    record_bytes = tracemalloc.get_traced_memory()[0] - base
+
+    dicts = [record.to_dict() for record in records]
+    del records
+    gc.collect()
+    dict_bytes = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    print(f"rows: {args.rows}")
+    print(f"held as dicts:   {dict_bytes * per_rows / 1e6:.1f} MB per 100k rows")
+    print(f"held as records: {record_bytes * per_rows / 1e6:.1f} MB per 100k rows")
+    print(f"build:           {build_time * per_rows:.2f} s per 100k rows")
+    print(f"  of which records: {record_time * per_rows:.2f} s per 100k rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,36 @@ TYPE = "ActualCost"
 TIMEFRAME = "Custom"
 GRANULARITY = "Daily"
 
+RESPONSE_MAX_ROWS = 5000
+RESPONSE_MAX_BYTES = 3 * 1024 * 1024
+RESPONSE_SIZE_SAMPLE_ROWS = 100
+REPORT_TARGET_ROWS = 1000000
+REPORT_WORKER_SIZE = 4
+PARSE_RANGE_BYTES = 16 * 1024 * 1024
+STRING_POOL_MAX_UNIQUE_RATIO = 0.1
+NORMALIZATION_CACHE_SIZE = 4096
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_SEGMENT_MIN_BYTES = 8 * 1024 * 1024
+DOWNLOAD_TIMEOUT = 300
+
+STATE_DIR = "/tmp/azure_cost_mgmt"
+STATE_FILE_NAME = "state.db"
+STATE_LOCK_TIMEOUT = 60
+CHECKPOINT_TTL = 2 * 24 * 60 * 60
+CLOSED_MONTH_DELAY_DAYS = 10
+SKIP_REVALIDATION_DAYS = 30
+BLOB_CACHE_DIR_NAME = "blob_cache"
+BLOB_CACHE_MAX_BYTES = 5 * 1024 * 1024 * 1024
+BLOB_CACHE_READ_SIZE = 1024 * 1024
+BLOB_CACHE_PIN_TTL = 24 * 60 * 60
+
+DISCOVERY_CACHE_TTL = 600
+CREDIT_CACHE_TTL = 600
+CLOSED_PERIOD_CREDIT_CACHE_TTL = 6 * 60 * 60
+SECRET_WORKER_SIZE = 4
+QUERY_CONCURRENCY = 4
+QUERY_PAGE_BUFFER_SIZE = 2
+
 AGGREGATION = {
     "totalCost": {"name": "Cost", "function": "Sum"},
     "UsageQuantity": {"name": "UsageQuantity", "function": "Sum"},
@@ -93,4 +123,6 @@ SCOPE_MAP = {
     "customer_tenant_id": "providers/Microsoft.Billing/billingAccounts/{billing_account_id}/customers/{customer_tenant_id}",
 }
 
+BENEFIT_MANIFEST_SCOPE = "benefit/{scope}"
+
 EXCLUDE_LICENSE_SERVICE_FAMILY = ["Office 365 Global"]
@@ -1 +1,4 @@
-from cloudforet.cost_analysis.connector.azure_cost_mgmt_connector import AzureCostMgmtConnector
\ No newline at end of file
+from cloudforet.cost_analysis.connector.azure_cost_mgmt_connector import (
+    AzureCostMgmtConnector,
+)
+from cloudforet.cost_analysis.connector.local_state_connector import LocalStateConnector
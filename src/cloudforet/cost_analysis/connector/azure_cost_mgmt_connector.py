@@ -1,22 +1,33 @@
+import asyncio
+import base64
+import copy
+import gzip
+import hashlib
+import json
 import logging
+import mmap
 import os
 import re
 import tempfile
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from functools import wraps
-from io import BytesIO
+from io import BufferedReader, RawIOBase
 from typing import get_type_hints, Union, Any, Generator
 
-import numpy as np
 import pandas as pd
 import requests
+import urllib3
+from dateutil.relativedelta import relativedelta
 from azure.core.exceptions import (
     ResourceNotFoundError,
     HttpResponseError,
     ServiceResponseError,
 )
-from azure.identity import DefaultAzureCredential
+from azure.identity import ClientSecretCredential
 from azure.mgmt.billing import BillingManagementClient
 from azure.mgmt.consumption import ConsumptionManagementClient
 from azure.mgmt.costmanagement import CostManagementClient
@@ -30,6 +41,12 @@ __all__ = ["AzureCostMgmtConnector"]
 _LOGGER = logging.getLogger("spaceone")
 
 _PAGE_SIZE = 5000
+_GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+_SCAN_BLOCK_SIZE = 1024 * 1024
+
+# billing account, customer and credit lookups shared by every manager in the process
+_LOOKUP_CACHE = {}
+_LOOKUP_CACHE_LOCK = threading.Lock()
 
 
 def azure_exception_handler(func):
@@ -51,6 +68,7 @@ def azure_exception_handler(func):
                 _print_error_log(error)
             elif error.status_code == "429":
                 _LOGGER.error(f"(RateLimit Error) => {error.message}")
+                _count_throttle(args)
 
                 wait_time = _extract_wait_time_for_retry(error.message)
                 time.sleep(wait_time)
@@ -65,6 +83,12 @@ def azure_exception_handler(func):
     return wrapper
 
 
+def _count_throttle(args: tuple) -> None:
+    connector = args[0] if args else None
+    if isinstance(getattr(connector, "counters", None), _CollectionCounters):
+        connector.counters.throttle_count += 1
+
+
 def _extract_wait_time_for_retry(message: str) -> int:
     default_wait_time = 60
     pattern = r"\d+"
@@ -92,32 +116,112 @@ def _get_empty_value(return_type: object) -> Any:
     return empty_values.get(return_type_name, None)
 
 
+def _get_lookup_cache(key: tuple) -> Any:
+    with _LOOKUP_CACHE_LOCK:
+        cache_info = _LOOKUP_CACHE.get(key)
+
+    if cache_info and cache_info["expired_at"] > time.monotonic():
+        return copy.deepcopy(cache_info["value"])
+    return None
+
+
+def _set_lookup_cache(key: tuple, value: Any, ttl: int) -> None:
+    now = time.monotonic()
+    expired_at = now + ttl
+    with _LOOKUP_CACHE_LOCK:
+        expired_keys = [
+            cached_key
+            for cached_key, cache_info in _LOOKUP_CACHE.items()
+            if cache_info["expired_at"] <= now
+        ]
+        for expired_key in expired_keys:
+            del _LOOKUP_CACHE[expired_key]
+
+        _LOOKUP_CACHE[key] = {
+            "value": copy.deepcopy(value),
+            "expired_at": expired_at,
+        }
+
+
 def _print_error_log(error) -> None:
     status_code = getattr(error, "status_code", "Unknown")
     _LOGGER.error(f"(Error) => {status_code} {error.message} {error}", exc_info=True)
 
 
+def _count_quotes(mapped_file: mmap.mmap, start: int, end: int) -> int:
+    # counted by blocks, so a large range is never copied into the heap at once
+    quote_count = 0
+    for block_start in range(start, end, _SCAN_BLOCK_SIZE):
+        block_end = min(block_start + _SCAN_BLOCK_SIZE, end)
+        quote_count += mapped_file[block_start:block_end].count(b'"')
+    return quote_count
+
+
+class _ByteRangeReader(RawIOBase):
+    """Read byte ranges of a memory map one after another as a single stream"""
+
+    def __init__(self, mapped_file: mmap.mmap, byte_ranges: list):
+        self.mapped_file = mapped_file
+        self.byte_ranges = list(reversed(byte_ranges))
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while self.byte_ranges:
+            start, end = self.byte_ranges[-1]
+            if start < end:
+                size = min(len(buffer), end - start)
+                buffer[:size] = self.mapped_file[start : start + size]
+                self.byte_ranges[-1] = (start + size, end)
+                return size
+            self.byte_ranges.pop()
+        return 0
+
+
+class _CollectionCounters(threading.local):
+    """Throttles, downloaded bytes and report latency of the current thread"""
+
+    def __init__(self):
+        self.throttle_count = 0
+        self.downloaded_bytes = 0
+        self.report_latency = 0.0
+
+
 class AzureCostMgmtConnector(BaseConnector):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.billing_client = None
         self.cost_mgmt_client = None
         self.billing_account_id = None
-        self.next_link = None
+        self.credential_key = None
+        # tenant streams run on threads, so every thread counts its own collection
+        self.counters = _CollectionCounters()
+        self.discovery_cache_ttl = DISCOVERY_CACHE_TTL
+        self.credit_cache_ttl = CREDIT_CACHE_TTL
+        self.closed_period_credit_cache_ttl = CLOSED_PERIOD_CREDIT_CACHE_TTL
 
     def create_session(self, options: dict, secret_data: dict, schema: str) -> None:
         self._check_secret_data(secret_data)
 
         subscription_id = secret_data.get("subscription_id", "")
 
-        os.environ["AZURE_SUBSCRIPTION_ID"] = subscription_id
-        os.environ["AZURE_TENANT_ID"] = secret_data["tenant_id"]
-        os.environ["AZURE_CLIENT_ID"] = secret_data["client_id"]
-        os.environ["AZURE_CLIENT_SECRET"] = secret_data["client_secret"]
-
-        credential = DefaultAzureCredential()
+        # credential is kept per session, so sessions of several secrets can run in threads
+        credential = ClientSecretCredential(
+            tenant_id=secret_data["tenant_id"],
+            client_id=secret_data["client_id"],
+            client_secret=secret_data["client_secret"],
+        )
 
         self.billing_account_id = secret_data.get("billing_account_id")
+        self.credential_key = self._make_credential_key(secret_data)
+        self.discovery_cache_ttl = options.get(
+            "discovery_cache_ttl", DISCOVERY_CACHE_TTL
+        )
+        self.credit_cache_ttl = options.get("credit_cache_ttl", CREDIT_CACHE_TTL)
+        self.closed_period_credit_cache_ttl = options.get(
+            "closed_period_credit_cache_ttl", CLOSED_PERIOD_CREDIT_CACHE_TTL
+        )
         self.billing_client = BillingManagementClient(
             credential=credential, subscription_id=subscription_id
         )
@@ -128,7 +232,26 @@ class AzureCostMgmtConnector(BaseConnector):
             credential=credential, subscription_id=subscription_id
         )
 
+    def _make_lookup_cache_key(self, *args) -> tuple:
+        # lookups are shared only by sessions of the same credential
+        return (self.credential_key, *args)
+
+    @staticmethod
+    def _make_credential_key(secret_data: dict) -> str:
+        credential_info = [
+            secret_data["tenant_id"],
+            secret_data["client_id"],
+            secret_data["client_secret"],
+        ]
+        return hashlib.sha256(json.dumps(credential_info).encode()).hexdigest()
+
     def list_customers_by_billing_account(self) -> list:
+        cache_key = self._make_lookup_cache_key(
+            "list_customers_by_billing_account", self.billing_account_id
+        )
+        if (billing_accounts_info := _get_lookup_cache(cache_key)) is not None:
+            return billing_accounts_info
+
         billing_accounts_info = []
 
         billing_accounts = self.billing_client.customers.list_by_billing_account(
@@ -144,6 +267,7 @@ class AzureCostMgmtConnector(BaseConnector):
                 }
             )
 
+        _set_lookup_cache(cache_key, billing_accounts_info, self.discovery_cache_ttl)
         return billing_accounts_info
 
     def query_usage_http(
@@ -156,51 +280,17 @@ class AzureCostMgmtConnector(BaseConnector):
         tenant_id: str,
     ):
         try:
-            api_version = "2025-03-01"
-
-            # Set next_link for collect_scope
-            # if collect_scope == "subscription_id":
-            #     subscription_id = secret_data.get("subscription_id")
-            #     self.next_link = f"https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.CostManagement/query?api-version={api_version}"
-            # else:
-            billing_account_id = secret_data.get("billing_account_id")
-            if (
-                account_agreement_type == "MicrosoftPartnerAgreement"
-                and collect_scope == "customer_tenant_id"
-            ):
-                self.next_link = f"https://management.azure.com/providers/Microsoft.Billing/billingAccounts/{billing_account_id}/customers/{tenant_id}/providers/Microsoft.CostManagement/query?api-version={api_version}"
-            else:
-                self.next_link = f"https://management.azure.com/providers/Microsoft.Billing/billingAccounts/{billing_account_id}/providers/Microsoft.CostManagement/query?api-version={api_version}"
-
-            # Set parameters for the cost management query
-            parameters = {
-                "type": TYPE,
-                "timeframe": TIMEFRAME,
-                "timePeriod": {"from": start.isoformat(), "to": end.isoformat()},
-                "dataset": {
-                    "granularity": GRANULARITY,
-                    "aggregation": AGGREGATION,
-                    "filter": BENEFIT_FILTER,
-                },
-            }
-
-            if account_agreement_type == "MicrosoftPartnerAgreement":
-                parameters["dataset"]["grouping"] = (
-                    BENEFIT_GROUPING + BENEFIT_GROUPING_MPA
-                )
-            elif account_agreement_type == "EnterpriseAgreement":
-                parameters["dataset"]["grouping"] = (
-                    BENEFIT_GROUPING + BENEFIT_GROUPING_EA
-                )
-            elif account_agreement_type == "MicrosoftCustomerAgreement":
-                parameters["dataset"]["grouping"] = (
-                    BENEFIT_GROUPING + BENEFIT_GROUPING_MCA
-                )
-            else:
-                parameters["dataset"]["grouping"] = BENEFIT_GROUPING
+            next_link, parameters = self._make_query_usage_request(
+                secret_data,
+                start,
+                end,
+                collect_scope,
+                account_agreement_type,
+                tenant_id,
+            )
 
-            while self.next_link:
-                url = self.next_link
+            while next_link:
+                url = next_link
                 headers = self._make_request_headers(secret_data)
 
                 _LOGGER.debug(f"[query_usage] url:{url}, parameters: {parameters}")
@@ -217,19 +307,233 @@ class AzureCostMgmtConnector(BaseConnector):
                         method="post",
                     )
 
-                self.next_link = response_json.get("properties").get("nextLink", None)
+                next_link = response_json.get("properties").get("nextLink", None)
                 yield response_json
         except Exception as e:
             _LOGGER.error(f"[ERROR] query_usage_http {e}", exc_info=True)
             raise ERROR_UNKNOWN(message=f"[ERROR] query_usage_http {e}")
 
+    def query_usage_streams(
+        self,
+        secret_data: dict,
+        queries: list,
+        concurrency: int = QUERY_CONCURRENCY,
+    ) -> Generator[tuple, Any, None]:
+        """Page through several usage queries concurrently on one event loop.
+        Pages are yielded as (query index, response) in the order of queries and
+        every query buffers at most QUERY_PAGE_BUFFER_SIZE pages ahead of the consumer.
+        """
+
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        loop.set_default_executor(executor)
+        loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+        loop_thread.start()
+
+        tasks = []
+        try:
+            page_queues, tasks = asyncio.run_coroutine_threadsafe(
+                self._start_query_usage_tasks(secret_data, queries, concurrency),
+                loop,
+            ).result()
+
+            for idx, page_queue in enumerate(page_queues):
+                while True:
+                    (
+                        response_json,
+                        throttle_count,
+                        error,
+                    ) = asyncio.run_coroutine_threadsafe(
+                        page_queue.get(), loop
+                    ).result()
+
+                    if error:
+                        _LOGGER.error(
+                            f"[ERROR] query_usage_streams {error}", exc_info=error
+                        )
+                        raise ERROR_UNKNOWN(
+                            message=f"[ERROR] query_usage_streams {error}"
+                        )
+                    elif response_json is None:
+                        break
+
+                    yield idx, response_json
+                    # counted when the consumer asks for the next page of the same query
+                    self.counters.throttle_count += throttle_count
+        finally:
+            asyncio.run_coroutine_threadsafe(
+                self._cancel_query_usage_tasks(tasks), loop
+            ).result()
+            loop.call_soon_threadsafe(loop.stop)
+            loop_thread.join()
+            loop.close()
+            executor.shutdown(wait=False)
+
+    async def _start_query_usage_tasks(
+        self, secret_data: dict, queries: list, concurrency: int
+    ) -> tuple:
+        # queries start in order, so the query being consumed always gets a stream slot
+        stream_semaphore = asyncio.Semaphore(concurrency * 2)
+        request_semaphore = asyncio.Semaphore(concurrency)
+        throttle_info = {"pause_until": 0.0}
+
+        page_queues = [asyncio.Queue(maxsize=QUERY_PAGE_BUFFER_SIZE) for _ in queries]
+        tasks = [
+            asyncio.ensure_future(
+                self._query_usage_pages(
+                    secret_data,
+                    query,
+                    page_queue,
+                    stream_semaphore,
+                    request_semaphore,
+                    throttle_info,
+                )
+            )
+            for query, page_queue in zip(queries, page_queues)
+        ]
+        return page_queues, tasks
+
+    @staticmethod
+    async def _cancel_query_usage_tasks(tasks: list) -> None:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _query_usage_pages(
+        self,
+        secret_data: dict,
+        query: dict,
+        page_queue: asyncio.Queue,
+        stream_semaphore: asyncio.Semaphore,
+        request_semaphore: asyncio.Semaphore,
+        throttle_info: dict,
+    ) -> None:
+        try:
+            async with stream_semaphore:
+                next_link, parameters = self._make_query_usage_request(
+                    secret_data, **query
+                )
+
+                while next_link:
+                    response_json, throttle_count = await self._post_query_usage(
+                        secret_data,
+                        next_link,
+                        parameters,
+                        request_semaphore,
+                        throttle_info,
+                    )
+                    next_link = response_json.get("properties").get("nextLink", None)
+                    await page_queue.put((response_json, throttle_count, None))
+
+            await page_queue.put((None, 0, None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await page_queue.put((None, 0, e))
+
+    async def _post_query_usage(
+        self,
+        secret_data: dict,
+        url: str,
+        parameters: dict,
+        request_semaphore: asyncio.Semaphore,
+        throttle_info: dict,
+    ) -> tuple:
+        """Return the response and how many times the request was throttled"""
+
+        loop = asyncio.get_running_loop()
+
+        for retry_count in range(RETRY_COUNT + 1):
+            async with request_semaphore:
+                # a throttled response pauses every query stream of the loop
+                pause_time = throttle_info["pause_until"] - loop.time()
+                if pause_time > 0:
+                    await asyncio.sleep(pause_time)
+
+                _LOGGER.debug(f"[query_usage] url:{url}, parameters: {parameters}")
+                response_headers, response_json = await loop.run_in_executor(
+                    None, self._post_request, secret_data, url, parameters
+                )
+
+            if not response_json.get("error"):
+                return response_json, retry_count
+
+            _LOGGER.error(f"[INFO] retry_request {response_headers}")
+            throttle_info["pause_until"] = max(
+                throttle_info["pause_until"],
+                loop.time() + self._get_sleep_time(response_headers),
+            )
+
+        raise ERROR_UNKNOWN(message=f"[ERROR] retry_request failed {response_json}")
+
+    def _post_request(self, secret_data: dict, url: str, parameters: dict) -> tuple:
+        headers = self._make_request_headers(secret_data)
+        response = requests.post(url=url, headers=headers, json=parameters)
+        return response.headers, response.json()
+
+    @staticmethod
+    def _make_query_usage_request(
+        secret_data: dict,
+        start: datetime,
+        end: datetime,
+        collect_scope: str,
+        account_agreement_type: str,
+        tenant_id: str,
+    ) -> tuple:
+        api_version = "2025-03-01"
+
+        # Set url for collect_scope
+        # if collect_scope == "subscription_id":
+        #     subscription_id = secret_data.get("subscription_id")
+        #     url = f"https://management.azure.com/subscriptions/{subscription_id}/providers/Microsoft.CostManagement/query?api-version={api_version}"
+        # else:
+        billing_account_id = secret_data.get("billing_account_id")
+        if (
+            account_agreement_type == "MicrosoftPartnerAgreement"
+            and collect_scope == "customer_tenant_id"
+        ):
+            url = f"https://management.azure.com/providers/Microsoft.Billing/billingAccounts/{billing_account_id}/customers/{tenant_id}/providers/Microsoft.CostManagement/query?api-version={api_version}"
+        else:
+            url = f"https://management.azure.com/providers/Microsoft.Billing/billingAccounts/{billing_account_id}/providers/Microsoft.CostManagement/query?api-version={api_version}"
+
+        # Set parameters for the cost management query
+        parameters = {
+            "type": TYPE,
+            "timeframe": TIMEFRAME,
+            "timePeriod": {"from": start.isoformat(), "to": end.isoformat()},
+            "dataset": {
+                "granularity": GRANULARITY,
+                "aggregation": AGGREGATION,
+                "filter": BENEFIT_FILTER,
+            },
+        }
+
+        if account_agreement_type == "MicrosoftPartnerAgreement":
+            parameters["dataset"]["grouping"] = BENEFIT_GROUPING + BENEFIT_GROUPING_MPA
+        elif account_agreement_type == "EnterpriseAgreement":
+            parameters["dataset"]["grouping"] = BENEFIT_GROUPING + BENEFIT_GROUPING_EA
+        elif account_agreement_type == "MicrosoftCustomerAgreement":
+            parameters["dataset"]["grouping"] = BENEFIT_GROUPING + BENEFIT_GROUPING_MCA
+        else:
+            parameters["dataset"]["grouping"] = BENEFIT_GROUPING
+
+        return url, parameters
+
     def get_billing_account(self) -> dict:
+        cache_key = self._make_lookup_cache_key(
+            "get_billing_account", self.billing_account_id
+        )
+        if (billing_account_info := _get_lookup_cache(cache_key)) is not None:
+            return billing_account_info
+
         billing_account_name = self.billing_account_id
         # todo : remove api_version
         billing_account_info = self.billing_client.billing_accounts.get(
             billing_account_name=billing_account_name, api_version="2020-05-01"
         )
         billing_account_info = self.convert_nested_dictionary(billing_account_info)
+
+        _set_lookup_cache(cache_key, billing_account_info, self.discovery_cache_ttl)
         return billing_account_info
 
     @staticmethod
@@ -283,36 +587,136 @@ class AzureCostMgmtConnector(BaseConnector):
         if account_agreement_type == "MicrosoftPartnerAgreement":
             credit_info = {}
         elif account_agreement_type == "EnterpriseAgreement":
+            cache_key = self._make_lookup_cache_key(
+                "get_credit_data", self.billing_account_id, billing_period_name
+            )
+            if (credit_info := _get_lookup_cache(cache_key)) is not None:
+                return credit_info
+
             response = self.consumption_client.balances.get_for_billing_period_by_billing_account(
                 billing_account_id=self.billing_account_id,
                 billing_period_name=billing_period_name,
             )
             credit_info = self.convert_nested_dictionary(response)
+
+            # balances of a closed billing period rarely change, so they are kept longer
+            if self._is_closed_billing_period(billing_period_name):
+                _set_lookup_cache(
+                    cache_key, credit_info, self.closed_period_credit_cache_ttl
+                )
+            else:
+                _set_lookup_cache(cache_key, credit_info, self.credit_cache_ttl)
         else:
             credit_info = {}
         return credit_info
 
-    def get_cost_data(self, blobs: list, options: dict) -> Generator[Any, Any, None]:
-        _LOGGER.debug(f"[get_cost_data] options: {options}")
-        total_cost_count = 0
-        for blob in blobs:
-            with tempfile.TemporaryFile() as temp_file:
-                self._download_cost_data(blob, temp_file)
-
-                df_chunk = pd.read_csv(
-                    BytesIO(temp_file.read()),
-                    low_memory=False,
-                    chunksize=_PAGE_SIZE,
+    @contextmanager
+    def open_blob_file(self, blob: dict, options: dict):
+        # a blob of the local blob cache is parsed without download
+        if blob_path := blob.get("blob_path"):
+            with open(blob_path, "rb") as blob_file:
+                yield blob_file
+            return
+
+        # the file is named, so parse workers can open it by its path
+        with tempfile.NamedTemporaryFile() as temp_file:
+            self.download_blob(blob, temp_file, options)
+            temp_file.flush()
+            yield temp_file
+
+    def download_blob(self, blob: dict, blob_file, options: dict) -> None:
+        self._download_cost_data(blob, blob_file, options)
+        self.counters.downloaded_bytes += os.fstat(blob_file.fileno()).st_size
+
+    def read_blob_file(
+        self, blob_file, options: dict
+    ) -> Generator[pd.DataFrame, Any, None]:
+        if not os.fstat(blob_file.fileno()).st_size:
+            _LOGGER.debug(f"[get_cost_data] skip empty blob")
+            return
+
+        # the report is parsed from a memory map, so it is read lazily through
+        # the page cache instead of being copied into the heap
+        with mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            # chunks are yielded as DataFrames and rows are built lazily by the manager
+            if mapped_file[: len(_GZIP_MAGIC_NUMBER)] == _GZIP_MAGIC_NUMBER:
+                # a gzip report is decompressed as a stream
+                with gzip.GzipFile(fileobj=mapped_file, mode="rb") as gzip_file:
+                    yield from self._read_csv_chunks(gzip_file)
+                return
+
+            yield from self._read_csv_chunks(mapped_file)
+
+    def get_byte_ranges(self, blob_file, options: dict) -> list:
+        """Split a large csv report into row aligned (start, end) byte ranges for
+        parse workers. An empty list means the report is read by one reader."""
+
+        parse_worker_size = options.get("parse_worker_size", 1)
+        parse_range_bytes = options.get("parse_range_bytes", PARSE_RANGE_BYTES)
+
+        if (
+            parse_worker_size <= 1
+            or os.fstat(blob_file.fileno()).st_size <= parse_range_bytes * 2
+        ):
+            return []
+
+        with mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            # a gzip report is decompressed as a stream, byte ranges do not apply
+            if mapped_file[: len(_GZIP_MAGIC_NUMBER)] == _GZIP_MAGIC_NUMBER:
+                return []
+
+            header_end = mapped_file.find(b"\n") + 1
+            return list(
+                self._split_byte_ranges(mapped_file, header_end, parse_range_bytes)
+            )
+
+    @staticmethod
+    def read_byte_range(
+        file_path: str, start: int, end: int
+    ) -> Generator[pd.DataFrame, Any, None]:
+        """Parse the rows of a byte range of a report with the header of the report"""
+
+        with open(file_path, "rb") as blob_file:
+            with mmap.mmap(
+                blob_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped_file:
+                header_end = mapped_file.find(b"\n") + 1
+                range_file = BufferedReader(
+                    _ByteRangeReader(mapped_file, [(0, header_end), (start, end)])
                 )
+                yield from AzureCostMgmtConnector._read_csv_chunks(range_file)
 
-                for df in df_chunk:
-                    df = df.replace({np.nan: None})
+    @staticmethod
+    def _read_csv_chunks(csv_file) -> Generator[pd.DataFrame, Any, None]:
+        with pd.read_csv(csv_file, low_memory=False, chunksize=_PAGE_SIZE) as df_chunk:
+            for df in df_chunk:
+                df.columns = df.columns.str.lower()
+                yield df
 
-                    costs_data = df.to_dict("records")
-                    total_cost_count += len(costs_data)
-                    yield costs_data
-                del df_chunk
-        _LOGGER.debug(f"[get_cost_data] total_cost_count: {total_cost_count}")
+    @staticmethod
+    def _split_byte_ranges(
+        mapped_file: mmap.mmap, start: int, range_bytes: int
+    ) -> Generator[tuple, Any, None]:
+        """Yield (start, end) ranges which end at a newline outside of a quoted field"""
+
+        size = len(mapped_file)
+        while start < size:
+            end = min(start + range_bytes, size)
+            quote_count = _count_quotes(mapped_file, start, end)
+
+            while end < size:
+                newline = mapped_file.find(b"\n", end)
+                if newline == -1:
+                    end = size
+                    break
+
+                quote_count += _count_quotes(mapped_file, end, newline + 1)
+                end = newline + 1
+                if quote_count % 2 == 0:
+                    break
+
+            yield start, end
+            start = end
 
     def convert_nested_dictionary(self, cloud_svc_object):
         cloud_svc_dict = {}
@@ -355,6 +759,7 @@ class AzureCostMgmtConnector(BaseConnector):
     def _retry_request(self, response, url, headers, json, retry_count, method="post"):
         try:
             _LOGGER.error(f"[INFO] retry_request {response.headers}")
+            self.counters.throttle_count += 1
             if retry_count == 0:
                 raise ERROR_UNKNOWN(
                     message=f"[ERROR] retry_request failed {response.json()}"
@@ -383,20 +788,183 @@ class AzureCostMgmtConnector(BaseConnector):
             _LOGGER.error(f"[ERROR] retry_request failed {e}")
             raise e
 
-    @staticmethod
-    def _download_cost_data(blob: dict, temp_file) -> None:
+    def _download_cost_data(self, blob: dict, temp_file, options: dict) -> None:
+        blob_link = blob.get("blob_link")
         try:
-            with requests.get(blob.get("blob_link"), stream=True) as response:
-                response.raise_for_status()
+            segment_count = options.get("download_segment_count", 1)
+            blob_info = self._get_blob_info(blob_link) if segment_count > 1 else {}
 
-                for chunk in response.iter_content(chunk_size=_PAGE_SIZE):
-                    temp_file.write(chunk)
+            if (
+                blob_info.get("accept_ranges")
+                and blob_info["size"] >= segment_count * DOWNLOAD_SEGMENT_MIN_BYTES
+            ):
+                self._download_segments(blob_link, temp_file, blob_info, segment_count)
+            else:
+                blob_info = self._download_range(
+                    blob_link, lambda position, chunk: temp_file.write(chunk)
+                )
+
+            temp_file.flush()
+            self._check_blob_integrity(temp_file, blob_info)
             temp_file.seek(0)
 
         except Exception as e:
             _LOGGER.error(f"[_download_cost_data] download error: {e}", exc_info=True)
             raise e
 
+    def _download_segments(
+        self, blob_link: str, temp_file, blob_info: dict, segment_count: int
+    ) -> None:
+        blob_size = blob_info["size"]
+        segment_size = -(-blob_size // segment_count)
+        temp_file.truncate(blob_size)
+        file_no = temp_file.fileno()
+
+        _LOGGER.debug(
+            f"[_download_cost_data] download {blob_size} bytes in {segment_count} segments"
+        )
+        with ThreadPoolExecutor(max_workers=segment_count) as executor:
+            futures = [
+                executor.submit(
+                    self._download_range,
+                    blob_link,
+                    lambda position, chunk: os.pwrite(file_no, chunk, position),
+                    start,
+                    min(start + segment_size, blob_size),
+                )
+                for start in range(0, blob_size, segment_size)
+            ]
+            for future in futures:
+                future.result()
+
+    def _download_range(
+        self, blob_link: str, write, start: int = 0, end: int = None
+    ) -> dict:
+        """Download the bytes [start, end) of a blob. A transient error resumes the
+        download from the last received byte with a Range request."""
+
+        position = start
+        blob_info = {}
+
+        for retry_count in range(RETRY_COUNT + 1):
+            headers = {}
+            if position or end is not None:
+                headers["Range"] = f"bytes={position}-{end - 1 if end else ''}"
+
+            try:
+                with requests.get(
+                    blob_link, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT
+                ) as response:
+                    response.raise_for_status()
+                    blob_info = blob_info or self._get_blob_info_from_headers(response)
+
+                    # a server which ignores the range sends the blob from the first byte
+                    skip_bytes = position if response.status_code != 206 else 0
+                    # compressed blobs are stored as they are sent and decompressed
+                    # while they are parsed
+                    for chunk in response.raw.stream(
+                        DOWNLOAD_CHUNK_SIZE, decode_content=False
+                    ):
+                        if skip_bytes:
+                            skipped = min(skip_bytes, len(chunk))
+                            chunk = chunk[skipped:]
+                            skip_bytes -= skipped
+                        if end is not None:
+                            chunk = chunk[: end - position]
+                        if chunk:
+                            write(position, chunk)
+                            position += len(chunk)
+                        if end is not None and position >= end:
+                            break
+
+                expected_end = end if end is not None else blob_info.get("size")
+                if expected_end is None or position >= expected_end:
+                    return blob_info
+
+                raise requests.exceptions.ChunkedEncodingError(
+                    f"connection closed at {position} of {expected_end} bytes"
+                )
+
+            except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+                if retry_count == RETRY_COUNT or not self._is_transient_download_error(
+                    e
+                ):
+                    raise e
+
+                _LOGGER.warning(
+                    f"[_download_cost_data] resume download from byte {position}: {e}"
+                )
+                time.sleep(2**retry_count)
+
+    def _get_blob_info(self, blob_link: str) -> dict:
+        response = requests.head(blob_link, timeout=DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return self._get_blob_info_from_headers(response)
+
+    @staticmethod
+    def _get_blob_info_from_headers(response) -> dict:
+        headers = response.headers
+        blob_info = {
+            "accept_ranges": headers.get("Accept-Ranges") == "bytes",
+            "md5": headers.get("x-ms-blob-content-md5"),
+            "size": None,
+        }
+
+        if response.status_code == 206:
+            total_size = headers.get("Content-Range", "").rsplit("/", 1)[-1]
+            if total_size.isdigit():
+                blob_info["size"] = int(total_size)
+        else:
+            blob_info["md5"] = blob_info["md5"] or headers.get("Content-MD5")
+
+            if headers.get("Content-Length"):
+                blob_info["size"] = int(headers["Content-Length"])
+
+        return blob_info
+
+    @staticmethod
+    def _check_blob_integrity(temp_file, blob_info: dict) -> None:
+        blob_size = os.fstat(temp_file.fileno()).st_size
+        if blob_info.get("size") is not None and blob_size != blob_info["size"]:
+            raise ERROR_BLOB_INTEGRITY(
+                reason=f"{blob_size} bytes received, {blob_info['size']} bytes expected"
+            )
+
+        if blob_info.get("md5"):
+            md5 = hashlib.md5()
+            temp_file.seek(0)
+            while chunk := temp_file.read(DOWNLOAD_CHUNK_SIZE):
+                md5.update(chunk)
+
+            if base64.b64encode(md5.digest()).decode() != blob_info["md5"]:
+                raise ERROR_BLOB_INTEGRITY(reason="MD5 mismatch")
+
+    @staticmethod
+    def _is_transient_download_error(error: Exception) -> bool:
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code >= 500
+
+        return isinstance(
+            error,
+            (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+                urllib3.exceptions.ProtocolError,
+                urllib3.exceptions.ReadTimeoutError,
+            ),
+        )
+
+    @staticmethod
+    def _is_closed_billing_period(billing_period_name: str) -> bool:
+        next_period_start = datetime.strptime(
+            billing_period_name, "%Y%m"
+        ) + relativedelta(months=1)
+        return (
+            next_period_start + timedelta(days=CLOSED_MONTH_DELAY_DAYS)
+            <= datetime.utcnow()
+        )
+
     @staticmethod
     def _get_sleep_time(response_headers):
         sleep_time = 30
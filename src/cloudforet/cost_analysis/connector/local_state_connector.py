@@ -0,0 +1,500 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Union
+
+from spaceone.core.connector import BaseConnector
+
+from cloudforet.cost_analysis.conf.cost_conf import *
+
+__all__ = ["LocalStateConnector"]
+
+_LOGGER = logging.getLogger("spaceone")
+
+_QUERY_PARAMS_SIZE = 500
+
+# columns added to the tables after their first version
+_ADDED_COLUMNS = {
+    "month_manifest": {"window_days": "INTEGER"},
+    "checkpoint": {
+        "blob_sizes": "TEXT",
+        "row_offset": "INTEGER",
+        "blob_rows": "TEXT",
+    },
+}
+
+_CREATE_TABLE_QUERIES = [
+    """
+    CREATE TABLE IF NOT EXISTS month_manifest (
+        scope TEXT NOT NULL,
+        month TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        blob_sizes TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        cost_total REAL NOT NULL,
+        unchanged_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL,
+        window_days INTEGER,
+        PRIMARY KEY (scope, month)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS checkpoint (
+        task_key TEXT NOT NULL,
+        month TEXT NOT NULL,
+        tenant TEXT NOT NULL,
+        window_days INTEGER NOT NULL DEFAULT 0,
+        blob_index INTEGER NOT NULL DEFAULT -1,
+        is_done INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL,
+        blob_sizes TEXT,
+        row_offset INTEGER,
+        blob_rows TEXT,
+        PRIMARY KEY (task_key, month, tenant)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS collection_stats (
+        tenant TEXT NOT NULL,
+        month TEXT NOT NULL,
+        job_type TEXT NOT NULL,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        byte_count INTEGER NOT NULL DEFAULT 0,
+        report_latency REAL NOT NULL DEFAULT 0,
+        throttle_count INTEGER NOT NULL DEFAULT 0,
+        failure_count INTEGER NOT NULL DEFAULT 0,
+        duration REAL NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (tenant, month, job_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS blob_cache (
+        cache_key TEXT NOT NULL,
+        blob_index INTEGER NOT NULL,
+        digest TEXT NOT NULL,
+        byte_count INTEGER NOT NULL,
+        last_used_at TEXT NOT NULL,
+        PRIMARY KEY (cache_key, blob_index)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS blob_cache_pin (
+        pin_id TEXT NOT NULL,
+        cache_key TEXT NOT NULL,
+        expired_at TEXT NOT NULL,
+        PRIMARY KEY (pin_id, cache_key)
+    )
+    """,
+]
+
+
+class LocalStateConnector(BaseConnector):
+    """Node local state shared by the collector processes (sqlite in WAL mode)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.state_path = None
+        self.blob_cache_dir = None
+
+    def create_session(self, options: dict) -> None:
+        state_dir = options.get("state_dir", STATE_DIR)
+        os.makedirs(state_dir, exist_ok=True)
+        self.state_path = os.path.join(state_dir, STATE_FILE_NAME)
+        self.blob_cache_dir = os.path.join(state_dir, BLOB_CACHE_DIR_NAME)
+        os.makedirs(self.blob_cache_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for query in _CREATE_TABLE_QUERIES:
+                conn.execute(query)
+
+            # state files of older versions miss the columns added since
+            for table, added_columns in _ADDED_COLUMNS.items():
+                table_columns = {
+                    row["name"] for row in conn.execute(f"PRAGMA table_info({table})")
+                }
+                for column, column_type in added_columns.items():
+                    if column not in table_columns:
+                        conn.execute(
+                            f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"
+                        )
+
+    def get_month_manifest(self, scope: str, month: str) -> Union[dict, None]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM month_manifest WHERE scope = ? AND month = ?",
+                (scope, month),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def get_latest_month_manifest(self, scope: str) -> Union[dict, None]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM month_manifest WHERE scope = ? ORDER BY month DESC LIMIT 1",
+                (scope,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def save_month_manifest(
+        self,
+        scope: str,
+        month: str,
+        blob_sizes: list,
+        row_count: int,
+        cost_total: float,
+        window_days: int = 0,
+    ) -> dict:
+        fingerprint = self._make_fingerprint(blob_sizes, row_count, cost_total)
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT fingerprint, unchanged_count FROM month_manifest WHERE scope = ? AND month = ?",
+                (scope, month),
+            ).fetchone()
+
+            if row and row["fingerprint"] == fingerprint:
+                unchanged_count = row["unchanged_count"] + 1
+            else:
+                unchanged_count = 0
+
+            conn.execute(
+                "INSERT OR REPLACE INTO month_manifest VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    scope,
+                    month,
+                    fingerprint,
+                    json.dumps(blob_sizes),
+                    row_count,
+                    cost_total,
+                    unchanged_count,
+                    datetime.utcnow().isoformat(),
+                    window_days,
+                ),
+            )
+
+        _LOGGER.debug(
+            f"[save_month_manifest] {scope} {month} fingerprint: {fingerprint}, unchanged_count: {unchanged_count}"
+        )
+        return {"fingerprint": fingerprint, "unchanged_count": unchanged_count}
+
+    def list_collection_stats(self, tenants: list, job_type: str) -> list:
+        collection_stats = []
+        with self._connect() as conn:
+            for idx in range(0, len(tenants), _QUERY_PARAMS_SIZE):
+                _tenants = tenants[idx : idx + _QUERY_PARAMS_SIZE]
+                rows = conn.execute(
+                    f"SELECT * FROM collection_stats WHERE job_type = ? AND tenant IN ({','.join('?' * len(_tenants))})",
+                    [job_type, *_tenants],
+                ).fetchall()
+                collection_stats.extend(dict(row) for row in rows)
+        return collection_stats
+
+    def save_collection_stats(
+        self,
+        tenant: str,
+        month: str,
+        job_type: str,
+        row_count: int,
+        byte_count: int,
+        report_latency: float,
+        throttle_count: int,
+        duration: float,
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO collection_stats (
+                    tenant, month, job_type, row_count, byte_count,
+                    report_latency, throttle_count, duration, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (tenant, month, job_type) DO UPDATE SET
+                    row_count = excluded.row_count,
+                    byte_count = excluded.byte_count,
+                    report_latency = excluded.report_latency,
+                    throttle_count = excluded.throttle_count,
+                    duration = excluded.duration,
+                    updated_at = excluded.updated_at
+                """,
+                (
+                    tenant,
+                    month,
+                    job_type,
+                    row_count,
+                    byte_count,
+                    report_latency,
+                    throttle_count,
+                    duration,
+                    datetime.utcnow().isoformat(),
+                ),
+            )
+
+    def save_collection_failure(self, tenant: str, month: str, job_type: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO collection_stats (
+                    tenant, month, job_type, failure_count, updated_at
+                ) VALUES (?, ?, ?, 1, ?)
+                ON CONFLICT (tenant, month, job_type) DO UPDATE SET
+                    failure_count = failure_count + 1,
+                    updated_at = excluded.updated_at
+                """,
+                (tenant, month, job_type, datetime.utcnow().isoformat()),
+            )
+
+    def get_checkpoints(self, task_key: str, ttl: int) -> dict:
+        """Return the checkpoints of a task saved within ttl seconds, older ones
+        are left over by failed runs and deleted"""
+
+        expired_at = (datetime.utcnow() - timedelta(seconds=ttl)).isoformat()
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM checkpoint WHERE task_key = ? AND updated_at < ?",
+                (task_key, expired_at),
+            )
+            rows = conn.execute(
+                "SELECT * FROM checkpoint WHERE task_key = ?", (task_key,)
+            ).fetchall()
+
+        checkpoints = {}
+        for row in rows:
+            checkpoint = dict(row)
+            for column in ["blob_sizes", "blob_rows"]:
+                checkpoint[column] = json.loads(row[column]) if row[column] else None
+            checkpoints[(row["month"], row["tenant"])] = checkpoint
+        return checkpoints
+
+    def save_checkpoint(
+        self,
+        task_key: str,
+        month: str,
+        tenant: str,
+        window_days: int = 0,
+        blob_index: int = -1,
+        row_offset: int = 0,
+        is_done: bool = False,
+        blob_sizes: list = None,
+        blob_rows: list = None,
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO checkpoint (
+                    task_key, month, tenant, window_days, blob_index, row_offset,
+                    is_done, updated_at, blob_sizes, blob_rows
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    task_key,
+                    month,
+                    tenant,
+                    window_days,
+                    blob_index,
+                    row_offset,
+                    int(is_done),
+                    datetime.utcnow().isoformat(),
+                    json.dumps(blob_sizes) if blob_sizes is not None else None,
+                    json.dumps(blob_rows) if blob_rows is not None else None,
+                ),
+            )
+
+    def delete_checkpoints(self, task_key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM checkpoint WHERE task_key = ?", (task_key,))
+
+    def get_cached_blobs(self, cache_key: str) -> list:
+        """Return the cached blobs of a report, a blob which fails the integrity
+        check drops the whole report from the cache"""
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM blob_cache WHERE cache_key = ? ORDER BY blob_index",
+                (cache_key,),
+            ).fetchall()
+
+        cached_blobs = []
+        for row in rows:
+            blob_path = os.path.join(self.blob_cache_dir, row["digest"])
+            if not self._is_valid_blob_file(
+                blob_path, row["digest"], row["byte_count"]
+            ):
+                _LOGGER.warning(
+                    f"[get_cached_blobs] {cache_key} blob #{row['blob_index']} is corrupted"
+                )
+                with self._connect() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    self._delete_cached_blobs(conn, [cache_key])
+                return []
+
+            cached_blobs.append(
+                {"blob_path": blob_path, "byte_count": row["byte_count"]}
+            )
+
+        if cached_blobs:
+            with self._connect() as conn:
+                conn.execute(
+                    "UPDATE blob_cache SET last_used_at = ? WHERE cache_key = ?",
+                    (datetime.utcnow().isoformat(), cache_key),
+                )
+        return cached_blobs
+
+    @contextmanager
+    def create_blob_cache_file(self):
+        blob_file = tempfile.NamedTemporaryFile(
+            dir=self.blob_cache_dir, prefix=".download-", delete=False
+        )
+        try:
+            with blob_file:
+                yield blob_file
+        finally:
+            if os.path.exists(blob_file.name):
+                os.remove(blob_file.name)
+
+    def save_cached_blob(self, cache_key: str, blob_index: int, file_path: str) -> dict:
+        digest = self._make_file_digest(file_path)
+        byte_count = os.path.getsize(file_path)
+        blob_path = os.path.join(self.blob_cache_dir, digest)
+
+        with self._connect() as conn:
+            # the file is moved under the write lock of the state file, so an eviction
+            # which drops the last report of the same digest does not remove it
+            conn.execute("BEGIN IMMEDIATE")
+            # blobs are stored by content, so the same report of several keys is kept once
+            os.replace(file_path, blob_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO blob_cache VALUES (?, ?, ?, ?, ?)",
+                (
+                    cache_key,
+                    blob_index,
+                    digest,
+                    byte_count,
+                    datetime.utcnow().isoformat(),
+                ),
+            )
+        return {"blob_path": blob_path, "byte_count": byte_count}
+
+    def pin_cached_blobs(self, cache_keys: list, ttl: int) -> str:
+        """Pin the reports of a reader until they are unpinned. Pins are kept in the
+        state file, so no process evicts a report which another one is reading.
+        The pins of a reader which died expire after ttl seconds."""
+
+        pin_id = uuid.uuid4().hex
+        expired_at = (datetime.utcnow() + timedelta(seconds=ttl)).isoformat()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO blob_cache_pin VALUES (?, ?, ?)",
+                [(pin_id, cache_key, expired_at) for cache_key in cache_keys],
+            )
+        return pin_id
+
+    def unpin_cached_blobs(self, pin_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM blob_cache_pin WHERE pin_id = ?", (pin_id,))
+
+    def evict_blob_cache(self, max_bytes: int) -> None:
+        """Drop the least recently used reports until the cache fits in max_bytes.
+        Pinned reports are still being read, so they are counted but never dropped."""
+
+        with self._connect() as conn:
+            # pins, reports and files are read and changed under the write lock of
+            # the state file, so a report pinned meanwhile is looked up after its drop
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM blob_cache_pin WHERE expired_at < ?",
+                (datetime.utcnow().isoformat(),),
+            )
+            pinned_keys = {
+                row["cache_key"]
+                for row in conn.execute("SELECT DISTINCT cache_key FROM blob_cache_pin")
+            }
+            rows = conn.execute("""
+                SELECT cache_key, SUM(byte_count) AS byte_count, MAX(last_used_at) AS last_used_at
+                FROM blob_cache GROUP BY cache_key ORDER BY last_used_at DESC
+                """).fetchall()
+
+            total_bytes = sum(
+                row["byte_count"] for row in rows if row["cache_key"] in pinned_keys
+            )
+            evicted_keys = []
+            for row in rows:
+                if row["cache_key"] in pinned_keys:
+                    continue
+
+                total_bytes += row["byte_count"]
+                if total_bytes > max_bytes:
+                    evicted_keys.append(row["cache_key"])
+
+            if evicted_keys:
+                _LOGGER.debug(
+                    f"[evict_blob_cache] evict {len(evicted_keys)} reports from blob cache"
+                )
+                self._delete_cached_blobs(conn, evicted_keys)
+
+    def _delete_cached_blobs(self, conn: sqlite3.Connection, cache_keys: list) -> None:
+        """Delete reports and the files no other report refers to. It runs in a
+        write transaction of conn, so no file is saved or looked up meanwhile."""
+
+        digests = set()
+        for idx in range(0, len(cache_keys), _QUERY_PARAMS_SIZE):
+            _cache_keys = cache_keys[idx : idx + _QUERY_PARAMS_SIZE]
+            params = ",".join("?" * len(_cache_keys))
+            rows = conn.execute(
+                f"SELECT digest FROM blob_cache WHERE cache_key IN ({params})",
+                _cache_keys,
+            ).fetchall()
+            digests.update(row["digest"] for row in rows)
+            conn.execute(
+                f"DELETE FROM blob_cache WHERE cache_key IN ({params})",
+                _cache_keys,
+            )
+
+        referenced_digests = {
+            row["digest"]
+            for row in conn.execute("SELECT DISTINCT digest FROM blob_cache")
+        }
+
+        for digest in digests - referenced_digests:
+            blob_path = os.path.join(self.blob_cache_dir, digest)
+            if os.path.exists(blob_path):
+                os.remove(blob_path)
+
+    def _is_valid_blob_file(self, blob_path: str, digest: str, byte_count: int) -> bool:
+        if not os.path.exists(blob_path) or os.path.getsize(blob_path) != byte_count:
+            return False
+        return self._make_file_digest(blob_path) == digest
+
+    @staticmethod
+    def _make_file_digest(file_path: str) -> str:
+        file_hash = hashlib.sha256()
+        with open(file_path, "rb") as blob_file:
+            while chunk := blob_file.read(BLOB_CACHE_READ_SIZE):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.state_path, timeout=STATE_LOCK_TIMEOUT)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _make_fingerprint(blob_sizes: list, row_count: int, cost_total: float) -> str:
+        fingerprint_info = {
+            "blob_sizes": sorted(blob_sizes),
+            "row_count": row_count,
+            "cost_total": round(cost_total, 6),
+        }
+        return hashlib.sha256(
+            json.dumps(fingerprint_info, sort_keys=True).encode()
+        ).hexdigest()
@@ -1,9 +1,11 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Generator
 
 from spaceone.core.error import ERROR_INVALID_PARAMETER_TYPE
 from spaceone.cost_analysis.plugin.data_source.lib.server import DataSourcePluginServer
 
+from .conf.cost_conf import SECRET_WORKER_SIZE
 from .manager import CostManager, DataSourceManager, JobManager
 
 app = DataSourcePluginServer()
@@ -77,15 +79,20 @@ def job_get_tasks(params: dict) -> dict:
         "synced_accounts": [],
     }
 
-    job_mgr = JobManager()
     params["schema"] = params.pop("schema_name", None)
     secret_data = params.pop("secret_data")
 
     secrets = secret_data.get("secrets", [secret_data])
-    for _secret_data in secrets:
-        params["secret_data"] = _secret_data
-        job_tasks = job_mgr.get_tasks(**params)
-
+    secrets_job_tasks = __map_secrets(
+        lambda job_mgr, _secret_data: job_mgr.get_tasks(
+            **params, secret_data=_secret_data
+        ),
+        JobManager,
+        secrets,
+        params.get("options", {}),
+    )
+
+    for job_tasks in secrets_job_tasks:
         tasks["tasks"].extend(job_tasks.get("tasks", []))
         tasks["changed"].extend(job_tasks.get("changed", []))
         tasks["synced_accounts"].extend(job_tasks.get("synced_accounts", []))
@@ -112,14 +119,21 @@ def cost_get_linked_accounts(params: dict) -> dict:
     }
     """
     result = []
-    cost_mgr = CostManager()
     params["schema"] = params.pop("schema_name", None)
     secret_data = params.pop("secret_data")
 
     secrets = secret_data.get("secrets", [secret_data])
-    for _secret_data in secrets:
-        params["secret_data"] = _secret_data
-        result.extend(cost_mgr.get_linked_accounts(**params))
+    secrets_accounts_info = __map_secrets(
+        lambda cost_mgr, _secret_data: cost_mgr.get_linked_accounts(
+            **params, secret_data=_secret_data
+        ),
+        CostManager,
+        secrets,
+        params.get("options", {}),
+    )
+
+    for accounts_info in secrets_accounts_info:
+        result.extend(accounts_info)
 
     return {"results": result}
 
@@ -166,17 +180,29 @@ def cost_get_data(params: dict) -> Generator[dict, None, None]:
     cost_metric = options.get("cost_metric", "ActualCost")
 
     if not is_benefit_job:
-        for cost_response in cost_mgr.get_data(**params):
-            yield {"results": cost_response}
+        response_stream = cost_mgr.get_data(**params)
     elif cost_metric == "AmortizedCost" and is_benefit_job:
-        for cost_response in cost_mgr.get_benefit_data(**params):
-            yield {"results": cost_response}
+        response_stream = cost_mgr.get_benefit_data(**params)
     else:
         _LOGGER.error(
             f"[get_cost_data] Check options, options: {options} , task_options: {task_options}"
         )
         raise Exception("Invalid cost_metric or is_benefit_job")
 
+    for cost_response in cost_mgr.pack_cost_responses(response_stream, options):
+        yield {"results": cost_response}
+
+
+def __map_secrets(func, manager_class, secrets: list, options: dict) -> list:
+    # managers are created in the request thread and results keep the order of secrets
+    managers = [manager_class() for _ in secrets]
+    max_workers = max(
+        min(len(secrets), options.get("secret_concurrency", SECRET_WORKER_SIZE)), 1
+    )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, managers, secrets))
+
 
 def __remove_duplicate_list_of_dict(changed: list) -> list:
     seen = set()
@@ -1,11 +1,23 @@
 import calendar
+import hashlib
 import json
 import logging
+import math
+import queue
+import threading
 import time
-from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import groupby
+from multiprocessing import get_context
+from operator import itemgetter
 from typing import Any, Generator, Union
 
 import pandas as pd
+from dateutil.relativedelta import relativedelta
 from spaceone.core.error import *
 from spaceone.core.manager import BaseManager
 
@@ -13,9 +25,20 @@ from cloudforet.cost_analysis.conf.cost_conf import *
 from cloudforet.cost_analysis.connector.azure_cost_mgmt_connector import (
     AzureCostMgmtConnector,
 )
+from cloudforet.cost_analysis.connector.local_state_connector import (
+    LocalStateConnector,
+)
+from cloudforet.cost_analysis.model import (
+    CostRecord,
+    CostDataRecord,
+    AdditionalInfoRecord,
+)
 
 _LOGGER = logging.getLogger("spaceone")
 
+# cost manager of a parse worker process, see _transform_byte_range
+_TRANSFORM_MANAGER = None
+
 
 class CostManager(BaseManager):
     def __init__(self, *args, **kwargs):
@@ -23,7 +46,38 @@ class CostManager(BaseManager):
         self.azure_cm_connector: AzureCostMgmtConnector = self.locator.get_connector(
             "AzureCostMgmtConnector"
         )
+        self.local_state_connector: LocalStateConnector = self.locator.get_connector(
+            "LocalStateConnector"
+        )
         self.retail_price_map = {}
+        # tenant streams may run on several threads and share the maps of the task
+        self.retail_price_lock = threading.Lock()
+        self.report_daily_rows = {}
+        self.checkpoint_task_key = None
+        self.checkpoint_interval = 1
+        self.checkpoints = {}
+        # parse workers of large reports, created by get_data for its task
+        self.parse_executor = None
+        # repeated strings of a task share one object
+        self.string_pool = {}
+        self.string_pool_lock = threading.Lock()
+        self.tag_value_count = 0
+        self.pooled_tag_value_count = 0
+
+    @classmethod
+    def _make_transform_manager(cls) -> "CostManager":
+        """A spawned parse worker has no locator config, so its manager only holds
+        the state used to build cost data"""
+
+        manager = cls.__new__(cls)
+        manager.azure_cm_connector = AzureCostMgmtConnector()
+        manager.retail_price_map = {}
+        manager.retail_price_lock = threading.Lock()
+        manager.string_pool = {}
+        manager.string_pool_lock = threading.Lock()
+        manager.tag_value_count = 0
+        manager.pooled_tag_value_count = 0
+        return manager
 
     def get_linked_accounts(
         self,
@@ -81,87 +135,856 @@ class CostManager(BaseManager):
         end = self._get_end_date_from_task_options(task_options)
         billing_tenant_id: str = task_options.get("billing_tenant_id")
         include_credit_cost: bool = task_options.get("include_credit_cost", False)
+        fan_out_customer_tenants: bool = (
+            collect_scope == "customer_tenant_id"
+            and task_options.get("fan_out_customer_tenants", False)
+        )
+        skip_months: list = task_options.get("skip_months", [])
 
-        monthly_time_period = self._make_monthly_time_period(start, end)
-        for time_period in monthly_time_period:
-            _start = time_period["start"]
-            _end = time_period["end"]
-            parameters = self._make_parameters(_start, _end, options)
+        if (
+            options.get("skip_unchanged_months", False)
+            or options.get("adaptive_time_window", False)
+            or options.get("use_blob_cache", False)
+            or self._use_collection_stats(options)
+        ):
+            self.local_state_connector.create_session(options)
+
+        if options.get("save_checkpoint") or options.get("resume_from_checkpoint"):
+            self._init_checkpoint(options, task_options, domain_id)
+
+        monthly_time_period = self._order_monthly_time_period(
+            self._make_monthly_time_period(start, end), options
+        )
+        with self._open_parse_executor(options):
+            for idx, time_period in enumerate(monthly_time_period):
+                _start = time_period["start"]
+                _end = time_period["end"]
+                month = _start.strftime("%Y-%m")
+
+                if month in skip_months:
+                    _LOGGER.info(
+                        f"[get_data] skip unchanged closed month {month}, domain_id: {domain_id}"
+                    )
+                    continue
+
+                start_time = time.time()
+                _LOGGER.info(
+                    f"[get_data] {tenant_ids} start to collect data from {_start} to {_end}"
+                )
+                if fan_out_customer_tenants:
+                    if self._is_checkpoint_done(month, "*"):
+                        _LOGGER.info(
+                            f"[get_data] skip {month} already collected before resume, domain_id: {domain_id}"
+                        )
+                        continue
+
+                    fan_out_response_stream = self._get_fan_out_cost_data(
+                        secret_data,
+                        task_options,
+                        _start,
+                        _end,
+                        options,
+                        tenant_ids,
+                        account_agreement_type,
+                        billing_tenant_id,
+                        domain_id,
+                    )
+                    yield from self._record_collection_stats(
+                        fan_out_response_stream, "*", month, "cost", options
+                    )
+                    self._save_checkpoint_done(month, "*")
+                else:
+                    tenant_response_streams = [
+                        self._get_tenant_response_stream(
+                            idx,
+                            secret_data,
+                            task_options,
+                            _start,
+                            _end,
+                            options,
+                            tenant_id,
+                            account_agreement_type,
+                            billing_tenant_id,
+                            include_credit_cost,
+                            domain_id,
+                        )
+                        for idx, tenant_id in enumerate(tenant_ids)
+                    ]
+                    tenant_concurrency = options.get("tenant_concurrency", 1)
+
+                    if tenant_concurrency > 1 and len(tenant_response_streams) > 1:
+                        yield from self._merge_response_streams(
+                            tenant_response_streams, tenant_concurrency
+                        )
+                    else:
+                        for tenant_response_stream in tenant_response_streams:
+                            yield from tenant_response_stream
+
+                end_time = time.time()
+                _LOGGER.info(
+                    f"[get_data] {month} collect is done in {int(end_time - start_time)} seconds ({idx + 1}/{len(monthly_time_period)} months), domain_id: {domain_id}"
+                )
+
+        if self.checkpoint_task_key:
+            self.local_state_connector.delete_checkpoints(self.checkpoint_task_key)
+
+        _LOGGER.debug(
+            f"[get_data] normalization cache: {self.get_normalization_cache_info()}, domain_id: {domain_id}"
+        )
+
+    def _get_tenant_response_stream(
+        self,
+        idx: int,
+        secret_data: dict,
+        task_options: dict,
+        start: datetime,
+        end: datetime,
+        options: dict,
+        tenant_id: str,
+        account_agreement_type: str,
+        billing_tenant_id: str,
+        include_credit_cost: bool,
+        domain_id: str,
+    ) -> Generator[list, Any, None]:
+        month = start.strftime("%Y-%m")
+        if self._is_checkpoint_done(month, tenant_id):
+            _LOGGER.info(
+                f"[get_data] #{idx + 1} {tenant_id} tenant {month} already collected before resume, domain_id: {domain_id}"
+            )
+            return
+
+        _LOGGER.info(
+            f"[get_data] #{idx + 1} {tenant_id} tenant start to collect data from {start} to {end}, domain_id: {domain_id}"
+        )
+        tenant_response_stream = self._get_tenant_cost_data(
+            secret_data,
+            task_options,
+            start,
+            end,
+            options,
+            tenant_id,
+            account_agreement_type,
+            billing_tenant_id,
+            include_credit_cost,
+        )
+        yield from self._record_collection_stats(
+            tenant_response_stream, tenant_id, month, "cost", options
+        )
+        self._save_checkpoint_done(month, tenant_id)
+        _LOGGER.info(
+            f"[get_data] #{idx + 1} {tenant_id} tenant collect is done, domain_id: {domain_id}"
+        )
+
+    @staticmethod
+    def _merge_response_streams(
+        response_streams: list, concurrency: int
+    ) -> Generator[list, Any, None]:
+        """Run response streams on worker threads and interleave their chunks in the
+        order they are ready. A stream resumes only after its previous chunk is sent,
+        so checkpoints saved after a yield stay valid. A failing stream does not stop
+        the others and its error is raised when all of them are finished."""
+
+        output_queue = queue.Queue()
+        sent_semaphores = [threading.Semaphore(0) for _ in response_streams]
+        stop_event = threading.Event()
+
+        def _produce(idx: int, response_stream: Generator) -> None:
+            try:
+                for results in response_stream:
+                    output_queue.put((idx, results, None))
+                    while not sent_semaphores[idx].acquire(timeout=1):
+                        if stop_event.is_set():
+                            response_stream.close()
+                            return
+            except Exception as e:
+                output_queue.put((idx, None, e))
+                return
+
+            output_queue.put((idx, None, None))
+
+        errors = []
+        remaining = len(response_streams)
+        executor = ThreadPoolExecutor(
+            max_workers=min(concurrency, len(response_streams))
+        )
+        try:
+            for idx, response_stream in enumerate(response_streams):
+                executor.submit(_produce, idx, response_stream)
+
+            while remaining:
+                idx, results, error = output_queue.get()
+                if results is not None:
+                    yield results
+                    sent_semaphores[idx].release()
+                    continue
+
+                remaining -= 1
+                if error:
+                    _LOGGER.error(
+                        f"[get_data] #{idx + 1} tenant collect is failed: {error}",
+                        exc_info=error,
+                    )
+                    errors.append(error)
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        if errors:
+            raise errors[0]
+
+    def _get_tenant_cost_data(
+        self,
+        secret_data: dict,
+        task_options: dict,
+        start: datetime,
+        end: datetime,
+        options: dict,
+        tenant_id: str,
+        account_agreement_type: str,
+        billing_tenant_id: str,
+        include_credit_cost: bool,
+    ) -> Generator[list, Any, None]:
+        collect_scope = task_options["collect_scope"]
+        scope = self._make_scope(secret_data, task_options, collect_scope, tenant_id)
+
+        yield from self._get_scope_cost_data(
+            scope,
+            start,
+            end,
+            options,
+            account_agreement_type,
+            billing_tenant_id,
+            tenant_id=tenant_id,
+        )
+
+        if include_credit_cost:
+            billing_period_name = start.strftime("%Y%m")
+            response = self.azure_cm_connector.get_credit_data(
+                billing_period_name=billing_period_name,
+                account_agreement_type=account_agreement_type,
+            )
+
+            yield self._make_credit_data(response, start, billing_tenant_id)
+
+    def _get_fan_out_cost_data(
+        self,
+        secret_data: dict,
+        task_options: dict,
+        start: datetime,
+        end: datetime,
+        options: dict,
+        tenant_ids: list,
+        account_agreement_type: str,
+        billing_tenant_id: str,
+        domain_id: str,
+    ) -> Generator[list, Any, None]:
+        """Collect customer tenants from one billing account scope report and
+        keep only the rows of the requested tenants."""
+
+        _LOGGER.info(
+            f"[get_data] {len(tenant_ids)} tenants start to collect data from billing account report, domain_id: {domain_id}"
+        )
+        scope = self._make_scope(secret_data, task_options, "billing_account_id")
+
+        # first sync tenants of the task are collected from an earlier month
+        month = start.strftime("%Y-%m")
+        tenant_start_months = task_options.get("tenant_start_months", {})
+        month_tenant_ids = [
+            tenant_id
+            for tenant_id in tenant_ids
+            if tenant_start_months.get(tenant_id, month) <= month
+        ]
+
+        yield from self._get_scope_cost_data(
+            scope,
+            start,
+            end,
+            options,
+            account_agreement_type,
+            billing_tenant_id,
+            customer_tenants={tenant_id.lower() for tenant_id in month_tenant_ids},
+            is_partial_month=len(month_tenant_ids) < len(tenant_ids),
+        )
 
-            start_time = time.time()
+        _LOGGER.info(
+            f"[get_data] billing account report collect is done, domain_id: {domain_id}"
+        )
+
+    def _get_scope_cost_data(
+        self,
+        scope: str,
+        start: datetime,
+        end: datetime,
+        options: dict,
+        account_agreement_type: str,
+        billing_tenant_id: str,
+        tenant_id: str = None,
+        customer_tenants: set = None,
+        is_partial_month: bool = False,
+    ) -> Generator[list, Any, None]:
+        month = start.strftime("%Y-%m")
+        checkpoint_tenant = tenant_id or "*"
+        checkpoint = self.checkpoints.get((month, checkpoint_tenant))
+
+        if checkpoint:
+            # keep the time windows of the interrupted run to resume at the same row
+            window_days = checkpoint["window_days"]
+            resume_position = (checkpoint["blob_index"], checkpoint["row_offset"])
+            sent_blob_rows = checkpoint["blob_rows"]
             _LOGGER.info(
-                f"[get_data] {tenant_ids} start to collect data from {_start} to {_end}"
+                f"[get_data] {scope} {month} resume after blob #{resume_position[0]} row #{resume_position[1]}"
             )
-            for idx, tenant_id in enumerate(tenant_ids):
+        else:
+            window_days = self._get_report_window_days(scope, start, end, options)
+            resume_position = (-1, 0)
+            sent_blob_rows = []
+
+        time_windows = self._make_report_time_windows(start, end, window_days)
+        report_blob_stream = self._get_report_blobs(scope, time_windows, options)
+        report_blobs = report_blob_stream
+
+        if checkpoint:
+            # open months are regenerated on every run, so the resume position
+            # only holds for the same blobs as the interrupted run. The stream is
+            # not exhausted, so its cached blobs stay pinned while they are read.
+            report_blobs = [next(report_blob_stream) for _ in time_windows]
+            if not self._is_checkpoint_report(report_blobs, checkpoint):
                 _LOGGER.info(
-                    f"[get_data] #{idx + 1} {tenant_id} tenant start to collect data from {_start} to {_end}, domain_id: {domain_id}"
+                    f"[get_data] {scope} {month} report changed after checkpoint, restart the month"
                 )
-                scope = self._make_scope(
-                    secret_data, task_options, collect_scope, tenant_id
+                checkpoint = None
+                resume_position = (-1, 0)
+                sent_blob_rows = []
+
+        report_rows = 0
+        blob_sizes = []
+        blob_rows = []
+        cost_total = 0.0
+        blob_index = -1
+        sent_chunks = 0
+
+        for time_window, blobs in report_blobs:
+            if not blobs:
+                _LOGGER.debug(f"[get_data] blobs: {blobs}")
+                _LOGGER.info(
+                    f"[get_data] {scope} collect skipped from {time_window['start']} to {time_window['end']}"
                 )
+                continue
 
-                blobs = self.azure_cm_connector.begin_create_operation(
-                    scope, parameters
-                )
+            blob_sizes.extend(blob.get("byte_count") or 0 for blob in blobs)
 
-                if not blobs:
-                    _LOGGER.debug(f"[get_data] blobs: {blobs}")
-                    _LOGGER.info(
-                        f"[get_data] #{idx + 1} {tenant_id} tenant collect skipped, domain_id: {domain_id}"
-                    )
+            for blob in blobs:
+                blob_index += 1
+                # blobs sent before the interruption are counted without being read
+                if blob_index < resume_position[0]:
+                    report_rows += sent_blob_rows[blob_index]
+                    blob_rows.append(sent_blob_rows[blob_index])
                     continue
 
-                response_stream = self.azure_cm_connector.get_cost_data(blobs, options)
-                for results in response_stream:
-                    yield self._make_cost_data(
-                        results=results,
-                        end=_end,
-                        tenant_id=tenant_id,
-                        options=options,
-                        account_agreement_type=account_agreement_type,
-                        billing_tenant_id=billing_tenant_id,
+                # rows of the blob up to resume_rows were sent before the interruption
+                resume_rows = (
+                    resume_position[1] if blob_index == resume_position[0] else 0
+                )
+                row_offset = 0
+                blob_cost_data = self._get_blob_cost_data(
+                    blob,
+                    options,
+                    resume_rows,
+                    end=time_window["end"],
+                    tenant_id=tenant_id,
+                    account_agreement_type=account_agreement_type,
+                    billing_tenant_id=billing_tenant_id,
+                    customer_tenants=customer_tenants,
+                )
+                for row_count, costs_data in blob_cost_data:
+                    report_rows += row_count
+                    row_offset += row_count
+                    if costs_data is None:
+                        continue
+
+                    cost_total += sum(cost_data["cost"] for cost_data in costs_data)
+                    yield costs_data
+
+                    # the consumer asks for the next chunk only after this one is sent.
+                    # Chunks are counted per stream, tenant streams may run on threads.
+                    sent_chunks += 1
+                    if sent_chunks % self.checkpoint_interval == 0:
+                        self._save_checkpoint(
+                            month,
+                            checkpoint_tenant,
+                            window_days,
+                            blob_index,
+                            row_offset,
+                            blob_sizes[: blob_index + 1],
+                            blob_rows,
+                        )
+
+                blob_rows.append(row_offset)
+
+        report_blob_stream.close()
+        self._set_report_daily_rows(scope, start, end, report_rows)
+
+        # a resumed month or a month of only some tenants of the task has no complete
+        # cost total, so its manifest is not updated. Row counts of the manifest
+        # also size the report windows of the next run.
+        if (
+            options.get("skip_unchanged_months", False)
+            or options.get("adaptive_time_window", False)
+        ) and not (checkpoint or is_partial_month):
+            self.local_state_connector.save_month_manifest(
+                scope, month, blob_sizes, report_rows, cost_total, window_days
+            )
+
+    def _get_blob_cost_data(
+        self, blob: dict, options: dict, resume_rows: int, **transform_args
+    ) -> Generator[tuple, Any, None]:
+        """Yield (report rows, cost data) of every chunk of a blob. The first
+        resume_rows rows were sent before, a chunk of only those rows has None as
+        cost data. Rows are counted instead of chunks, so a blob is resumed at the
+        same row when the parse options split it into other chunks."""
+
+        with self.azure_cm_connector.open_blob_file(blob, options) as blob_file:
+            # a resumed blob is read by one reader, which can start at any row
+            if not resume_rows and (
+                byte_ranges := self.azure_cm_connector.get_byte_ranges(
+                    blob_file, options
+                )
+            ):
+                yield from self._transform_byte_ranges(
+                    blob_file.name, byte_ranges, options, transform_args
+                )
+                return
+
+            row_offset = 0
+            response_stream = self.azure_cm_connector.read_blob_file(blob_file, options)
+            for results in response_stream:
+                row_count = len(results)
+                if row_offset + row_count <= resume_rows:
+                    yield row_count, None
+                else:
+                    if row_offset < resume_rows:
+                        results = results.iloc[resume_rows - row_offset :].copy()
+
+                    yield row_count, self._make_cost_data(
+                        results=results, options=options, **transform_args
                     )
+                row_offset += row_count
+
+    @contextmanager
+    def _open_parse_executor(self, options: dict) -> Generator[None, Any, None]:
+        """Create the parse workers shared by the large reports of a task. They are
+        spawned on first use, so a task without large reports starts no process."""
+
+        parse_worker_size = options.get("parse_worker_size", 1)
+        if parse_worker_size <= 1:
+            yield
+            return
 
-                if include_credit_cost:
-                    billing_period_name = _start.strftime("%Y%m")
-                    response = self.azure_cm_connector.get_credit_data(
-                        billing_period_name=billing_period_name,
-                        account_agreement_type=account_agreement_type,
+        # spawned workers do not inherit the threads and locks of the server process
+        self.parse_executor = ProcessPoolExecutor(
+            max_workers=parse_worker_size, mp_context=get_context("spawn")
+        )
+        try:
+            yield
+        finally:
+            self.parse_executor.shutdown(wait=True, cancel_futures=True)
+            self.parse_executor = None
+
+    def _transform_byte_ranges(
+        self, file_path: str, byte_ranges: list, options: dict, transform_args: dict
+    ) -> Generator[tuple, Any, None]:
+        """Parse and transform the byte ranges of a large report on the parse workers
+        of the task. Chunks are yielded in the order of the rows and at most parse_worker_size + 1
+        ranges are transformed or waiting to be sent at a time."""
+
+        parse_worker_size = options["parse_worker_size"]
+        futures = deque()
+        try:
+            for start, end in byte_ranges:
+                futures.append(
+                    self.parse_executor.submit(
+                        _transform_byte_range,
+                        file_path,
+                        start,
+                        end,
+                        options,
+                        transform_args,
                     )
+                )
+                if len(futures) > parse_worker_size:
+                    yield from self._load_transformed_chunks(futures.popleft())
+
+            while futures:
+                yield from self._load_transformed_chunks(futures.popleft())
+        finally:
+            # ranges of a closed stream are not transformed, the pool is kept for the task
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def _load_transformed_chunks(future: Future) -> Generator[tuple, Any, None]:
+        for row_count, cost_values in future.result():
+            yield row_count, [CostRecord.from_values(values) for values in cost_values]
+
+    @staticmethod
+    def _is_checkpoint_report(report_blobs: list, checkpoint: dict) -> bool:
+        # checkpoints of older versions have no blob sizes or row counts
+        if (
+            checkpoint["blob_sizes"] is None
+            or checkpoint["row_offset"] is None
+            or checkpoint["blob_rows"] is None
+        ):
+            return False
+
+        blob_sizes = [
+            blob.get("byte_count") or 0
+            for _, blobs in report_blobs
+            for blob in blobs or []
+        ]
+        return blob_sizes[: len(checkpoint["blob_sizes"])] == checkpoint["blob_sizes"]
+
+    def _get_report_blobs(
+        self, scope: str, time_windows: list, options: dict
+    ) -> Generator[tuple, Any, None]:
+        """Read reports of closed months from the local blob cache and generate
+        the others. Generated reports of closed months are added to the cache."""
+
+        if not options.get("use_blob_cache", False):
+            yield from self._create_reports(scope, time_windows, options)
+            return
+
+        cache_keys = [
+            (
+                self._make_blob_cache_key(scope, time_window, options)
+                if self._is_closed_month(time_window["start"])
+                else None
+            )
+            for time_window in time_windows
+        ]
+        # reports are pinned before they are looked up, so no task evicts them
+        # until they are read
+        pin_id = self.local_state_connector.pin_cached_blobs(
+            [cache_key for cache_key in cache_keys if cache_key], BLOB_CACHE_PIN_TTL
+        )
 
-                    yield self._make_credit_data(response, _start, billing_tenant_id)
+        try:
+            yield from self._read_report_blobs(scope, time_windows, cache_keys, options)
+        finally:
+            self.local_state_connector.unpin_cached_blobs(pin_id)
+
+    def _read_report_blobs(
+        self, scope: str, time_windows: list, cache_keys: list, options: dict
+    ) -> Generator[tuple, Any, None]:
+        cached_blobs = [
+            self.local_state_connector.get_cached_blobs(cache_key) if cache_key else []
+            for cache_key in cache_keys
+        ]
+
+        uncached_time_windows = [
+            time_window
+            for time_window, blobs in zip(time_windows, cached_blobs)
+            if not blobs
+        ]
+        reports = (
+            self._create_reports(scope, uncached_time_windows, options)
+            if uncached_time_windows
+            else iter([])
+        )
 
+        for time_window, cache_key, blobs in zip(
+            time_windows, cache_keys, cached_blobs
+        ):
+            if blobs:
                 _LOGGER.info(
-                    f"[get_data] #{idx + 1} {tenant_id} tenant collect is done, domain_id: {domain_id}"
+                    f"[get_data] {scope} read {len(blobs)} blobs from blob cache from {time_window['start']} to {time_window['end']}"
+                )
+                yield time_window, blobs
+                continue
+
+            _, blobs = next(reports)
+            if cache_key and blobs:
+                blobs = self._save_blob_cache(cache_key, blobs, options)
+            yield time_window, blobs
+
+    def _save_blob_cache(self, cache_key: str, blobs: list, options: dict) -> list:
+        cached_blobs = []
+        for blob_index, blob in enumerate(blobs):
+            with self.local_state_connector.create_blob_cache_file() as blob_file:
+                self.azure_cm_connector.download_blob(blob, blob_file, options)
+                blob_file.flush()
+                cached_blobs.append(
+                    self.local_state_connector.save_cached_blob(
+                        cache_key, blob_index, blob_file.name
+                    )
                 )
 
-            end_time = time.time()
+        self.local_state_connector.evict_blob_cache(
+            options.get("blob_cache_max_bytes", BLOB_CACHE_MAX_BYTES)
+        )
+        return cached_blobs
+
+    def _make_blob_cache_key(self, scope: str, time_window: dict, options: dict) -> str:
+        parameters = self._make_parameters(
+            time_window["start"], time_window["end"], options
+        )
+        cache_info = {"scope": scope, "parameters": parameters}
+        return hashlib.sha256(
+            json.dumps(cache_info, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def _create_reports(
+        self, scope: str, time_windows: list, options: dict
+    ) -> Generator[tuple, Any, None]:
+        if len(time_windows) == 1:
+            time_window = time_windows[0]
+            parameters = self._make_parameters(
+                time_window["start"], time_window["end"], options
+            )
+            blobs, report_latency, _ = self._begin_create_operation(scope, parameters)
+            self.azure_cm_connector.counters.report_latency += report_latency
+            yield time_window, blobs
+            return
+
+        _LOGGER.info(
+            f"[get_data] {scope} report is split into {len(time_windows)} time windows"
+        )
+
+        # generate reports of every time window in parallel and download them in order
+        max_workers = min(len(time_windows), REPORT_WORKER_SIZE)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self._begin_create_operation,
+                    scope,
+                    self._make_parameters(
+                        time_window["start"], time_window["end"], options
+                    ),
+                )
+                for time_window in time_windows
+            ]
+
+            for time_window, future in zip(time_windows, futures):
+                blobs, report_latency, throttle_count = future.result()
+                # reports are created on worker threads but counted for this stream
+                self.azure_cm_connector.counters.report_latency += report_latency
+                self.azure_cm_connector.counters.throttle_count += throttle_count
+                yield time_window, blobs
+
+    def _begin_create_operation(self, scope: str, parameters: dict) -> tuple:
+        counters = self.azure_cm_connector.counters
+        started_at = time.time()
+        throttle_count = counters.throttle_count
+        blobs = self.azure_cm_connector.begin_create_operation(scope, parameters)
+        return (
+            blobs,
+            time.time() - started_at,
+            counters.throttle_count - throttle_count,
+        )
+
+    def _get_report_window_days(
+        self, scope: str, start: datetime, end: datetime, options: dict
+    ) -> int:
+        """Choose weekly or daily report windows when the estimated report size of
+        the scope exceeds report_target_rows, 0 keeps the whole monthly period.
+        The Cost Details API accepts at most one month, so sparse months are not merged.
+        """
+
+        if not options.get("adaptive_time_window", False):
+            return 0
+
+        daily_rows = self.report_daily_rows.get(scope)
+        if daily_rows is None:
+            daily_rows = self._get_manifest_daily_rows(scope)
+
+        if not daily_rows:
+            return 0
+
+        target_rows = options.get("report_target_rows", REPORT_TARGET_ROWS)
+        days = (end.date() - start.date()).days + 1
+
+        if daily_rows * days <= target_rows:
+            return 0
+        elif daily_rows * 7 <= target_rows:
+            return 7
+        else:
+            return 1
+
+    def _get_manifest_daily_rows(self, scope: str) -> Union[float, None]:
+        """Estimate the daily rows of a scope from the latest month manifest, so the
+        first month of a run is split too"""
+
+        month_manifest = self.local_state_connector.get_latest_month_manifest(scope)
+        if not month_manifest:
+            return None
+
+        month_start = datetime.strptime(month_manifest["month"], "%Y-%m")
+        month_end = month_start + relativedelta(months=1) - timedelta(days=1)
+        # an open month was collected up to the day its manifest was saved
+        collected_end = min(
+            month_end, datetime.fromisoformat(month_manifest["updated_at"])
+        )
+
+        self._set_report_daily_rows(
+            scope, month_start, collected_end, month_manifest["row_count"]
+        )
+        return self.report_daily_rows[scope]
+
+    @staticmethod
+    def _make_report_time_windows(
+        start: datetime, end: datetime, window_days: int
+    ) -> list:
+        if not window_days:
+            return [{"start": start, "end": end}]
+
+        time_windows = []
+        window_start = start
+
+        while True:
+            window_end = window_start + timedelta(days=window_days - 1)
+            if window_end.date() >= end.date():
+                time_windows.append({"start": window_start, "end": end})
+                break
+
+            time_windows.append({"start": window_start, "end": window_end})
+            window_start = window_end + timedelta(days=1)
+
+        return time_windows
+
+    def _init_checkpoint(
+        self, options: dict, task_options: dict, domain_id: str
+    ) -> None:
+        self.local_state_connector.create_session(options)
+        self.checkpoint_task_key = self._make_task_key(task_options, domain_id)
+        self.checkpoint_interval = max(options.get("checkpoint_interval", 1), 1)
+
+        if options.get("resume_from_checkpoint"):
+            self.checkpoints = self.local_state_connector.get_checkpoints(
+                self.checkpoint_task_key,
+                options.get("checkpoint_ttl", CHECKPOINT_TTL),
+            )
             _LOGGER.info(
-                f"[get_data] all collect is done in {int(end_time - start_time)} seconds"
+                f"[get_data] resume from {len(self.checkpoints)} checkpoints, task_key: {self.checkpoint_task_key}"
+            )
+
+    def _is_checkpoint_done(self, month: str, tenant: str) -> bool:
+        # an open month gets new rows after it is done, so it is collected again
+        checkpoint = self.checkpoints.get((month, tenant))
+        return bool(
+            checkpoint
+            and checkpoint["is_done"]
+            and self._is_closed_month(datetime.strptime(month, "%Y-%m"))
+        )
+
+    def _save_checkpoint(
+        self,
+        month: str,
+        tenant: str,
+        window_days: int,
+        blob_index: int,
+        row_offset: int,
+        blob_sizes: list,
+        blob_rows: list,
+    ) -> None:
+        # checkpoint_interval 1 bounds duplicated data after resume to one chunk
+        if self.checkpoint_task_key:
+            self.local_state_connector.save_checkpoint(
+                self.checkpoint_task_key,
+                month,
+                tenant,
+                window_days,
+                blob_index,
+                row_offset,
+                blob_sizes=blob_sizes,
+                blob_rows=blob_rows,
+            )
+
+    def _save_checkpoint_done(self, month: str, tenant: str) -> None:
+        if self.checkpoint_task_key:
+            self.local_state_connector.save_checkpoint(
+                self.checkpoint_task_key, month, tenant, is_done=True
             )
 
+    def _record_collection_stats(
+        self,
+        response_stream: Generator[list, Any, None],
+        tenant: str,
+        month: str,
+        job_type: str,
+        options: dict,
+    ) -> Generator[list, Any, None]:
+        """Save rows, bytes, report latency, throttles and duration of a tenant-month.
+        The stream is read on one thread, so the counters of that thread are its own."""
+
+        if not self._use_collection_stats(options):
+            yield from response_stream
+            return
+
+        counters = self.azure_cm_connector.counters
+        started_at = time.time()
+        downloaded_bytes = counters.downloaded_bytes
+        throttle_count = counters.throttle_count
+        report_latency = counters.report_latency
+        row_count = 0
+
+        try:
+            for results in response_stream:
+                row_count += len(results)
+                yield results
+        except Exception:
+            self.local_state_connector.save_collection_failure(tenant, month, job_type)
+            raise
+
+        self.local_state_connector.save_collection_stats(
+            tenant,
+            month,
+            job_type,
+            row_count=row_count,
+            byte_count=counters.downloaded_bytes - downloaded_bytes,
+            report_latency=counters.report_latency - report_latency,
+            throttle_count=counters.throttle_count - throttle_count,
+            duration=time.time() - started_at,
+        )
+
+    @staticmethod
+    def _use_collection_stats(options: dict) -> bool:
+        return options.get("save_collection_stats", False) or options.get(
+            "balance_tasks_by_volume", False
+        )
+
+    @staticmethod
+    def _make_task_key(task_options: dict, domain_id: str) -> str:
+        task_info = {"task_options": task_options, "domain_id": domain_id}
+        return hashlib.sha256(
+            json.dumps(task_info, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    def _set_report_daily_rows(
+        self, scope: str, start: datetime, end: datetime, report_rows: int
+    ) -> None:
+        days = (end.date() - start.date()).days + 1
+        self.report_daily_rows[scope] = report_rows / days
+
     def _make_cost_data(
         self,
-        results: list,
+        results: pd.DataFrame,
         end: datetime,
         options: dict,
         tenant_id: str = None,
         account_agreement_type: str = None,
         billing_tenant_id: str = None,
+        customer_tenants: set = None,
     ) -> list:
         """Source Data Model"""
 
         costs_data = []
         try:
-            for result in results:
-                result = {key.lower(): value for key, value in result.items()}
+            results = self._filter_cost_chunk(results, options, customer_tenants)
 
+            for result in self._iter_chunk_rows(results):
                 billed_date = self._set_billed_date(result.get("date", end))
                 if not billed_date:
                     continue
-
-                if self._exclude_cost_data_with_options(result, options):
-                    continue
+                billed_date = self.string_pool.setdefault(billed_date, billed_date)
 
                 data = self._make_data_info(
                     result,
@@ -179,6 +1002,137 @@ class CostManager(BaseManager):
 
         return costs_data
 
+    def _filter_cost_chunk(
+        self, df: pd.DataFrame, options: dict, customer_tenants: set = None
+    ) -> pd.DataFrame:
+        """Drop excluded rows of a chunk with column masks before rows are built"""
+
+        mask = pd.Series(True, index=df.index)
+        customer_tenant_ids = df.get("customertenantid")
+
+        if customer_tenants is not None:
+            if customer_tenant_ids is None:
+                return df.iloc[0:0]
+            mask &= self._is_present(customer_tenant_ids) & customer_tenant_ids.astype(
+                str
+            ).str.lower().isin(customer_tenants)
+
+        # customer rows without a customer tenant id are not routed to any tenant
+        if "customername" in df:
+            customer_name_only = self._is_present(df["customername"])
+            if customer_tenant_ids is not None:
+                customer_name_only &= ~self._is_present(customer_tenant_ids)
+            mask &= ~customer_name_only
+
+        if options.get("exclude_license_cost", False) and "servicefamily" in df:
+            mask &= ~df["servicefamily"].isin(EXCLUDE_LICENSE_SERVICE_FAMILY)
+
+        if options.get("exclude_zero_cost_rows", False):
+            zero_columns = [
+                column
+                for column in [
+                    "costinbillingcurrency",
+                    "paygcostinbillingcurrency",
+                    "quantity",
+                ]
+                if column in df
+            ]
+            if zero_columns:
+                zero_mask = pd.Series(True, index=df.index)
+                for column in zero_columns:
+                    zero_mask &= self._is_zero(df[column])
+                mask &= ~zero_mask
+
+        if "date" in df:
+            df["date"] = self._parse_billed_dates(df["date"])
+            mask &= df["date"].notna()
+
+        if mask.all():
+            return df
+        return df[mask]
+
+    @staticmethod
+    def _parse_billed_dates(dates: pd.Series) -> pd.Series:
+        # same formats as _set_billed_date, rows which fail to parse become NaT
+        if pd.api.types.is_integer_dtype(dates):
+            return pd.to_datetime(dates.astype(str), format="%Y%m%d", errors="coerce")
+        elif pd.api.types.is_datetime64_any_dtype(dates):
+            return dates
+        return pd.to_datetime(dates, format="%m/%d/%Y", errors="coerce")
+
+    @staticmethod
+    def _is_present(values: pd.Series) -> pd.Series:
+        return values.notna() & values.ne("")
+
+    @staticmethod
+    def _is_zero(values: pd.Series) -> pd.Series:
+        return pd.to_numeric(values, errors="coerce").fillna(0.0).eq(0.0)
+
+    def _iter_chunk_rows(self, df: pd.DataFrame) -> Generator[dict, Any, None]:
+        """Build one dict per row from the columns of a chunk, NaN is read as None"""
+
+        columns = list(df.columns)
+        # string columns are dictionary encoded, numeric columns are boxed to python types
+        column_values = [
+            (
+                self._encode_string_column(df[column])
+                if pd.api.types.is_string_dtype(df[column].dtype)
+                else df[column].tolist()
+            )
+            for column in columns
+        ]
+        nan_columns = [column for column in columns if df[column].hasnans]
+
+        for values in zip(*column_values):
+            result = dict(zip(columns, values))
+            for column in nan_columns:
+                value = result[column]
+                if value != value:
+                    result[column] = None
+            yield result
+
+    def _encode_string_column(self, values: pd.Series) -> Any:
+        codes, uniques = pd.factorize(
+            values.to_numpy(dtype=object), use_na_sentinel=False
+        )
+
+        # only low cardinality values are kept in the pool for the rest of the task
+        if len(uniques) <= len(codes) * STRING_POOL_MAX_UNIQUE_RATIO:
+            uniques[:] = [
+                (
+                    self.string_pool.setdefault(value, value)
+                    if isinstance(value, str)
+                    else value
+                )
+                for value in uniques
+            ]
+
+        return uniques.take(codes)
+
+    def _intern_tags(self, tags: dict) -> dict:
+        string_pool = self.string_pool
+        interned_tags = {}
+
+        with self.string_pool_lock:
+            self.tag_value_count += len(tags)
+
+            for key, value in tags.items():
+                # values such as resource names are unique, so new values are pooled
+                # only while they stay within STRING_POOL_MAX_UNIQUE_RATIO of the values
+                if isinstance(value, str):
+                    pooled_value = string_pool.get(value)
+                    if pooled_value is not None:
+                        value = pooled_value
+                    elif (
+                        self.pooled_tag_value_count
+                        < self.tag_value_count * STRING_POOL_MAX_UNIQUE_RATIO
+                    ):
+                        string_pool[value] = value
+                        self.pooled_tag_value_count += 1
+
+                interned_tags[string_pool.setdefault(key, key)] = value
+        return interned_tags
+
     def _make_data_info(
         self,
         result: dict,
@@ -187,7 +1141,7 @@ class CostManager(BaseManager):
         tenant_id: str = None,
         account_agreement_type: str = None,
         billing_tenant_id: str = None,
-    ) -> dict:
+    ) -> CostRecord:
         additional_info: dict = self._get_additional_info(result, options, tenant_id)
 
         if billing_tenant_id:
@@ -210,7 +1164,9 @@ class CostManager(BaseManager):
         usage_unit: str = str(result.get("unitofmeasure", ""))
         region_code: str = self._get_region_code(result.get("resourcelocation", ""))
         product: str = self._get_product_from_result(result)
-        tags: dict = self._convert_tags_str_to_dict(result.get("tags"))
+        tags: dict = self._intern_tags(
+            self._convert_tags_str_to_dict(result.get("tags"))
+        )
 
         # Set Network Traffic Cost at Additional Info
         additional_info: dict = self._set_network_traffic_cost(
@@ -223,15 +1179,15 @@ class CostManager(BaseManager):
             "usage_type": usage_type,
             "usage_unit": usage_unit,
             "provider": "azure",
-            "region_code": REGION_MAP.get(region_code, region_code),
+            "region_code": region_code,
             "product": product,
             "tags": tags,
             "billed_date": billed_date,
-            "data": aggregate_data,
-            "additional_info": additional_info,
+            "data": CostDataRecord(aggregate_data),
+            "additional_info": AdditionalInfoRecord(additional_info),
         }
 
-        return data
+        return CostRecord(data)
 
     def _get_additional_info(self, result: dict, options: dict, tenant_id: str = None):
         additional_info = {}
@@ -357,18 +1313,7 @@ class CostManager(BaseManager):
 
         if options.get("cost_metric") == "AmortizedCost":
             if result.get("pricingmodel") in ["Reservation", "SavingsPlan"]:
-                meter_id = result.get("meterid")
-                product_id = result.get("productid")
-                currency = result.get("billingcurrency", "USD")
-                if not self.retail_price_map.get(f"{meter_id}:{product_id}"):
-                    unit_price = self._get_unit_price_from_meter_id(
-                        meter_id, product_id, currency
-                    )
-                    self.retail_price_map[f"{meter_id}:{product_id}"] = unit_price
-
-                additional_info["PayG Unit Price"] = self.retail_price_map[
-                    f"{meter_id}:{product_id}"
-                ]
+                additional_info["PayG Unit Price"] = self._get_retail_unit_price(result)
 
         return additional_info
 
@@ -388,43 +1333,131 @@ class CostManager(BaseManager):
         account_agreement_type = task_options.get("account_agreement_type")
         start: datetime = self._get_first_date_of_month(task_options["start"])
         end: datetime = datetime.utcnow()
+        skip_months: list = task_options.get("skip_months", [])
+        customer_tenants = None
 
-        monthly_time_period = self._make_monthly_time_period(start, end)
+        if collect_scope == "customer_tenant_id" and task_options.get(
+            "fan_out_customer_tenants", False
+        ):
+            # one billing account query per month is split to the tenants locally
+            customer_tenants = {tenant_id.lower() for tenant_id in tenant_ids}
+            query_collect_scope = "billing_account_id"
+            query_tenant_ids = ["*"]
+        else:
+            query_collect_scope = collect_scope
+            query_tenant_ids = tenant_ids
 
+        if options.get("skip_unchanged_months", False) or self._use_collection_stats(
+            options
+        ):
+            self.local_state_connector.create_session(options)
+
+        monthly_time_period = self._order_monthly_time_period(
+            self._make_monthly_time_period(start, end), options
+        )
+
+        benefit_queries = []
         for time_period in monthly_time_period:
             _start = time_period["start"]
             _end = time_period["end"]
 
-            start_time = time.time()
+            if _start.strftime("%Y-%m") in skip_months:
+                _LOGGER.info(
+                    f"[get_benefit_data] skip unchanged closed month {_start.strftime('%Y-%m')}, domain_id: {domain_id}"
+                )
+                continue
+
+            for tenant_id in query_tenant_ids:
+                benefit_queries.append(
+                    {
+                        "start": _start,
+                        "end": _end,
+                        "collect_scope": query_collect_scope,
+                        "account_agreement_type": account_agreement_type,
+                        "tenant_id": tenant_id,
+                    }
+                )
+
+        start_time = time.time()
+        _LOGGER.info(
+            f"[get_benefit_data] {tenant_ids} start to collect data from {start} to {end}"
+        )
+
+        query_concurrency = options.get("benefit_query_concurrency", 1)
+        if query_concurrency > 1:
+            query_pages = self.azure_cm_connector.query_usage_streams(
+                secret_data, benefit_queries, query_concurrency
+            )
+        else:
+            query_pages = (
+                (idx, response_json)
+                for idx, benefit_query in enumerate(benefit_queries)
+                for response_json in self.azure_cm_connector.query_usage_http(
+                    secret_data, **benefit_query
+                )
+            )
+
+        for idx, pages in groupby(query_pages, key=itemgetter(0)):
+            benefit_query = benefit_queries[idx]
             _LOGGER.info(
-                f"[get_benefit_data] {tenant_ids} start to collect data from {_start} to {_end}"
+                f"[get_benefit_data] #{idx + 1} {benefit_query['tenant_id']} tenant start to collect data from {benefit_query['start']} to {benefit_query['end']}, domain_id: {domain_id}"
             )
-            for idx, tenant_id in enumerate(tenant_ids):
-                _LOGGER.info(
-                    f"[get_benefit_data] #{idx + 1} {tenant_id} tenant start to collect data from {_start} to {_end}, domain_id: {domain_id}"
+
+            benefit_response_stream = (
+                self._make_benefit_cost_data(
+                    results=results,
+                    end=benefit_query["end"],
+                    options=options,
+                    billing_tenant_id=billing_tenant_id,
+                    customer_tenants=customer_tenants,
                 )
+                for _, results in pages
+            )
+            month = benefit_query["start"].strftime("%Y-%m")
 
-                response_stream = self.azure_cm_connector.query_usage_http(
+            if options.get("skip_unchanged_months", False):
+                scope = self._make_scope(
                     secret_data,
-                    _start,
-                    _end,
-                    collect_scope,
-                    account_agreement_type,
-                    tenant_id,
+                    task_options,
+                    query_collect_scope,
+                    benefit_query["tenant_id"],
+                )
+                benefit_response_stream = self._record_benefit_manifest(
+                    benefit_response_stream, scope, month
                 )
 
-                for results in response_stream:
-                    yield self._make_benefit_cost_data(
-                        results=results,
-                        end=_end,
-                        options=options,
-                        billing_tenant_id=billing_tenant_id,
-                    )
+            yield from self._record_collection_stats(
+                benefit_response_stream,
+                benefit_query["tenant_id"],
+                month,
+                "benefit",
+                options,
+            )
 
-            end_time = time.time()
-            _LOGGER.info(
-                f"[get_benefit_data] all collect is done in {int(end_time - start_time)} seconds"
+        end_time = time.time()
+        _LOGGER.info(
+            f"[get_benefit_data] all collect is done in {int(end_time - start_time)} seconds"
+        )
+
+    def _record_benefit_manifest(
+        self, response_stream: Generator[list, Any, None], scope: str, month: str
+    ) -> Generator[list, Any, None]:
+        """Benefit rows come from the query API, so their month manifest has no
+        report blobs and is kept next to the cost manifest of the same scope."""
+
+        row_count = 0
+        cost_total = 0.0
+
+        for costs_data in response_stream:
+            row_count += len(costs_data)
+            cost_total += sum(
+                cost_data["data"]["Actual Cost"] for cost_data in costs_data
             )
+            yield costs_data
+
+        self.local_state_connector.save_month_manifest(
+            BENEFIT_MANIFEST_SCOPE.format(scope=scope), month, [], row_count, cost_total
+        )
 
     def _make_benefit_cost_data(
         self,
@@ -433,17 +1466,23 @@ class CostManager(BaseManager):
         options: dict,
         billing_tenant_id: str = None,
         account_agreement_type: str = None,
+        customer_tenants: set = None,
     ) -> list:
         benefit_costs_data = []
         total_count = 0
 
         try:
+            rows = results.get("properties").get("rows")
             combined_results = self._combine_rows_and_columns_from_results(
-                results.get("properties").get("rows"),
-                results.get("properties").get("columns"),
+                rows, results.get("properties").get("columns")
             )
-            total_count += len(combined_results)
+            total_count += len(rows)
             for cb_result in combined_results:
+                if customer_tenants is not None and not self._is_customer_tenant_row(
+                    cb_result, customer_tenants, key="CustomerTenantId"
+                ):
+                    continue
+
                 billed_at = self._set_billed_date(cb_result.get("UsageDate", end))
                 if not billed_at:
                     continue
@@ -461,7 +1500,7 @@ class CostManager(BaseManager):
 
     def _make_benefit_cost_info(
         self, result: dict, options: dict, billing_tenant_id: str, billed_at: str
-    ) -> dict:
+    ) -> CostRecord:
         cost = 0
 
         additional_info = {
@@ -523,13 +1562,87 @@ class CostManager(BaseManager):
             "product": result.get("MeterCategory"),
             "tags": {},
             "billed_date": billed_at,
-            "data": {
-                "Actual Cost": actual_cost,
-            },
-            "additional_info": additional_info,
+            "data": CostDataRecord({"Actual Cost": actual_cost}),
+            "additional_info": AdditionalInfoRecord(additional_info),
         }
 
-        return data
+        return CostRecord(data)
+
+    def pack_cost_responses(
+        self, response_stream: Generator[list, Any, None], options: dict
+    ) -> Generator[list, Any, None]:
+        """Re-pack transformed cost data into responses bounded by row count and
+        estimated serialized size. Only one source chunk and one pending response
+        are held in memory at a time."""
+
+        max_rows = options.get("response_max_rows", RESPONSE_MAX_ROWS)
+        max_bytes = options.get("response_max_bytes", RESPONSE_MAX_BYTES)
+
+        # with checkpoints a response never spans two chunks, so a chunk is
+        # fully sent before the next one is requested
+        merge_chunks = not (
+            options.get("save_checkpoint") or options.get("resume_from_checkpoint")
+        )
+
+        batch = []
+        batch_size = 0
+        for results in response_stream:
+            # walking every field of every row costs a third of the transform, so only
+            # the user defined tags, which can be large, are measured per row
+            fields_size = self._estimate_chunk_fields_size(results)
+            for cost_data in results:
+                # cost data is kept in compact records until it is packed
+                cost_data = cost_data.to_dict()
+                cost_data_size = fields_size
+                if tags := cost_data.get("tags"):
+                    cost_data_size += self._estimate_serialized_size(tags)
+
+                if batch and (
+                    len(batch) >= max_rows or batch_size + cost_data_size > max_bytes
+                ):
+                    yield batch
+                    batch = []
+                    batch_size = 0
+
+                batch.append(cost_data)
+                batch_size += cost_data_size
+
+            if batch and not merge_chunks:
+                yield batch
+                batch = []
+                batch_size = 0
+
+        if batch:
+            yield batch
+
+    def _estimate_chunk_fields_size(self, results: list) -> int:
+        """Mean estimated size of the rows of a chunk without their tags, measured on
+        a sample. Rows of a chunk come from one report and have the same fields."""
+
+        sample = results[:: max(len(results) // RESPONSE_SIZE_SAMPLE_ROWS, 1)]
+        if not sample:
+            return 0
+
+        sample_size = 0
+        for cost_data in sample:
+            cost_data = cost_data.to_dict()
+            tags_size = self._estimate_serialized_size(cost_data.get("tags", {}))
+            sample_size += self._estimate_serialized_size(cost_data) - tags_size
+        return math.ceil(sample_size / len(sample))
+
+    def _estimate_serialized_size(self, value: Any) -> int:
+        # approximation of the protobuf Struct encoding (tag + length per field)
+        if isinstance(value, dict):
+            return sum(
+                len(key) + 4 + self._estimate_serialized_size(_value)
+                for key, _value in value.items()
+            )
+        elif isinstance(value, (list, tuple)):
+            return sum(self._estimate_serialized_size(_value) + 2 for _value in value)
+        elif isinstance(value, str):
+            return len(value) + 2
+        else:
+            return 9
 
     @staticmethod
     def _make_credit_data(
@@ -553,7 +1666,10 @@ class CostManager(BaseManager):
         if billing_tenant_id:
             credit_data["additional_info"]["Billing Tenant Id"] = billing_tenant_id
 
-        credits_data.append(credit_data)
+        credit_data["additional_info"] = AdditionalInfoRecord(
+            credit_data["additional_info"]
+        )
+        credits_data.append(CostRecord(credit_data))
         return credits_data
 
     def _get_cost_from_result_with_options(self, result: dict, options: dict) -> float:
@@ -652,23 +1768,27 @@ class CostManager(BaseManager):
 
     def _get_retail_cost(self, result: dict) -> float:
         exchange_rate = 1.0
-        meter_id = result.get("meterid")
-        product_id = result.get("productid")
-        currency = result.get("billingcurrency", "USD")
         quantity = self._convert_str_to_float_format(result.get("quantity", 0.0))
-
-        if not self.retail_price_map.get(f"{meter_id}:{product_id}"):
-            unit_price = self._get_unit_price_from_meter_id(
-                meter_id, product_id, currency
-            )
-            self.retail_price_map[f"{meter_id}:{product_id}"] = unit_price
-
-        unit_price = self.retail_price_map[f"{meter_id}:{product_id}"]
+        unit_price = self._get_retail_unit_price(result)
 
         retail_cost = exchange_rate * quantity * unit_price
 
         return retail_cost
 
+    def _get_retail_unit_price(self, result: dict) -> float:
+        meter_id = result.get("meterid")
+        product_id = result.get("productid")
+        currency = result.get("billingcurrency", "USD")
+        price_key = f"{meter_id}:{product_id}"
+
+        # threads of the task look up a meter once and wait for each other
+        with self.retail_price_lock:
+            if not self.retail_price_map.get(price_key):
+                self.retail_price_map[price_key] = self._get_unit_price_from_meter_id(
+                    meter_id, product_id, currency
+                )
+            return self.retail_price_map[price_key]
+
     def _get_saved_cost(self, result: dict, cost: float) -> float:
         saved_cost = 0
 
@@ -722,8 +1842,25 @@ class CostManager(BaseManager):
         return product
 
     @staticmethod
+    @lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
     def _get_region_code(resource_location: str) -> str:
-        return resource_location.lower() if resource_location else resource_location
+        region_code = (
+            resource_location.lower() if resource_location else resource_location
+        )
+        return REGION_MAP.get(region_code, region_code)
+
+    @classmethod
+    def get_normalization_cache_info(cls) -> dict:
+        """Hits, misses and size of the memoized per-row normalizations"""
+
+        return {
+            name: normalize.cache_info()._asdict()
+            for name, normalize in [
+                ("region_code", cls._get_region_code),
+                ("benefit_product", cls._set_product_from_benefit_name),
+                ("usage_type_details", cls._get_usage_type_details),
+            ]
+        }
 
     @staticmethod
     def _make_parameters(start: datetime, end: datetime, options: dict) -> dict:
@@ -795,6 +1932,7 @@ class CostManager(BaseManager):
             return tags
 
     @staticmethod
+    @lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
     def _set_product_from_benefit_name(benefit_name):
         _product_name_format = "Reserved {product_name}"
         product_name = _product_name_format.format(product_name=benefit_name)
@@ -861,6 +1999,32 @@ class CostManager(BaseManager):
     def _convert_date_format_to_utc(date_format: str) -> datetime:
         return datetime.strptime(date_format, "%Y-%m-%d").replace(tzinfo=timezone.utc)
 
+    def _order_monthly_time_period(
+        self, monthly_time_period: list, options: dict
+    ) -> list:
+        """recent_first collects the open months first and then the closed months
+        from the newest to the oldest, so the freshest data is sent earliest."""
+
+        if options.get("month_order", "oldest_first") != "recent_first":
+            return monthly_time_period
+
+        open_time_period = []
+        closed_time_period = []
+
+        for time_period in monthly_time_period:
+            if self._is_closed_month(time_period["start"]):
+                closed_time_period.append(time_period)
+            else:
+                open_time_period.append(time_period)
+
+        return open_time_period + closed_time_period[::-1]
+
+    @staticmethod
+    def _is_closed_month(date: datetime) -> bool:
+        month_start = date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        closed_before = datetime.utcnow() - timedelta(days=CLOSED_MONTH_DELAY_DAYS)
+        return month_start + relativedelta(months=1) <= closed_before
+
     def _make_monthly_time_period(
         self, start_date: datetime, end_date: datetime
     ) -> list:
@@ -932,18 +2096,16 @@ class CostManager(BaseManager):
             raise ERROR_REQUIRED_PARAMETER(key="task_options.customer_tenants")
 
     @staticmethod
-    def _exclude_cost_data_with_options(result: dict, options: dict) -> bool:
-        if result.get("customername") and not result.get("customertenantid"):
-            return True
-        if options.get("exclude_license_cost", False):
-            if result.get("servicefamily") in EXCLUDE_LICENSE_SERVICE_FAMILY:
-                return True
-
-        return False
+    def _is_customer_tenant_row(
+        result: dict, customer_tenants: set, key: str = "customertenantid"
+    ) -> bool:
+        customer_tenant_id = result.get(key)
+        return bool(customer_tenant_id) and (
+            str(customer_tenant_id).lower() in customer_tenants
+        )
 
-    @staticmethod
     def _set_network_traffic_cost(
-        additional_info: dict, result: dict, usage_type: str
+        self, additional_info: dict, result: dict, usage_type: str
     ) -> dict:
         meter_category = result.get("metercategory", "") or ""
         meter_name = result.get("metername", "") or ""
@@ -958,28 +2120,39 @@ class CostManager(BaseManager):
             else:
                 additional_info["Usage Type Details"] = "Transfer Etc"
 
-        elif meter_category in ["Bandwidth", "Azure Front Door Service"]:
-            if "Data Transfer In" in meter_name:
-                additional_info["Usage Type Details"] = "Transfer In"
-            elif "Data Transfer Out" in meter_name:
-                additional_info["Usage Type Details"] = "Transfer Out"
-            else:
-                additional_info["Usage Type Details"] = "Transfer Etc"
+        elif usage_type_details := self._get_usage_type_details(
+            meter_category, meter_name
+        ):
+            additional_info["Usage Type Details"] = usage_type_details
+
+        return additional_info
 
-        elif "Data Transfer" in meter_name:
+    @staticmethod
+    @lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+    def _get_usage_type_details(
+        meter_category: str, meter_name: str
+    ) -> Union[str, None]:
+        # substring searches on the meter name are done once per meter
+        if (
+            meter_category in ["Bandwidth", "Azure Front Door Service"]
+            or "Data Transfer" in meter_name
+        ):
             if "Data Transfer In" in meter_name:
-                additional_info["Usage Type Details"] = "Transfer In"
+                return "Transfer In"
             elif "Data Transfer Out" in meter_name:
-                additional_info["Usage Type Details"] = "Transfer Out"
+                return "Transfer Out"
             else:
-                additional_info["Usage Type Details"] = "Transfer Etc"
+                return "Transfer Etc"
 
-        return additional_info
+        return None
 
     @staticmethod
-    def _combine_rows_and_columns_from_results(rows: list, columns: list):
+    def _combine_rows_and_columns_from_results(
+        rows: list, columns: list
+    ) -> Generator[dict, Any, None]:
+        # column names are resolved once per page and paired with each row lazily
         _columns = [column.get("name") for column in columns]
-        return pd.DataFrame(data=rows, columns=_columns).to_dict(orient="records")
+        return (dict(zip(_columns, row)) for row in rows)
 
     def _get_end_date_from_task_options(self, task_options: dict) -> datetime:
         end_date = datetime.utcnow()
@@ -987,4 +2160,27 @@ class CostManager(BaseManager):
         if "end" in task_options:
             if end_date.strftime("%Y-%m") < task_options["end"]:
                 end_date = self._get_last_date_of_month(end_date.year, end_date.month)
+            elif end_date.strftime("%Y-%m") > task_options["end"]:
+                end_month = self._get_first_date_of_month(task_options["end"])
+                end_date = self._get_last_date_of_month(end_month.year, end_month.month)
         return end_date
+
+
+def _transform_byte_range(
+    file_path: str, start: int, end: int, options: dict, transform_args: dict
+) -> list:
+    """Build the cost data of a byte range of a report in a parse worker process"""
+
+    global _TRANSFORM_MANAGER
+    if _TRANSFORM_MANAGER is None:
+        _TRANSFORM_MANAGER = CostManager._make_transform_manager()
+
+    transformed_chunks = []
+    for results in AzureCostMgmtConnector.read_byte_range(file_path, start, end):
+        costs_data = _TRANSFORM_MANAGER._make_cost_data(
+            results=results, options=options, **transform_args
+        )
+        transformed_chunks.append(
+            (len(results), [cost_data.to_values() for cost_data in costs_data])
+        )
+    return transformed_chunks
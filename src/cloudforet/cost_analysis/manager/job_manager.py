@@ -1,14 +1,27 @@
+import json
 import logging
 import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Tuple, Union
 
 from dateutil.relativedelta import relativedelta
 from spaceone.core.manager import BaseManager
 
-from cloudforet.cost_analysis.conf.cost_conf import SECRET_TYPE_DEFAULT
-from cloudforet.cost_analysis.connector import AzureCostMgmtConnector
+from cloudforet.cost_analysis.conf.cost_conf import (
+    BENEFIT_MANIFEST_SCOPE,
+    CLOSED_MONTH_DELAY_DAYS,
+    REPORT_WORKER_SIZE,
+    SCOPE_MAP,
+    SECRET_TYPE_DEFAULT,
+    SKIP_REVALIDATION_DAYS,
+)
+from cloudforet.cost_analysis.connector import (
+    AzureCostMgmtConnector,
+    LocalStateConnector,
+)
 from cloudforet.cost_analysis.error.cost import *
+from cloudforet.cost_analysis.manager.cost_manager import CostManager
 
 _LOGGER = logging.getLogger("spaceone")
 
@@ -19,6 +32,7 @@ class JobManager(BaseManager):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.azure_cm_connector: AzureCostMgmtConnector = AzureCostMgmtConnector()
+        self.local_state_connector: LocalStateConnector = LocalStateConnector()
 
     def get_tasks(
         self,
@@ -50,24 +64,11 @@ class JobManager(BaseManager):
 
                 # Only for MicrosoftPartnerAgreement
                 if options.get("collect_scope") == "billing_account_id":
-                    start = datetime.strptime(start_month, "%Y-%m")
-                    end = datetime.utcnow()
-
-                    month_range = relativedelta(end, start).months
-                    month_range_step = math.ceil((month_range + 1) / _TASK_LIST_SIZE)
-
-                    for month in range(
-                        0,
-                        month_range + 1,
-                        math.ceil((month_range + 1) / _TASK_LIST_SIZE),
-                    ):
-                        task_start_month = datetime.strftime(
-                            start + relativedelta(months=month), "%Y-%m"
-                        )
-                        task_end_month = datetime.strftime(
-                            start + relativedelta(months=month + month_range_step - 1),
-                            "%Y-%m",
-                        )
+                    divided_months = self._get_divided_months(
+                        options, secret_data, start_month
+                    )
+
+                    for task_start_month, task_end_month in divided_months:
                         task = self._get_task_scope_billing_account_id(
                             secret_data,
                             billing_account_agreement_type,
@@ -90,9 +91,16 @@ class JobManager(BaseManager):
                         customer_tenants.extend(first_sync_tenants)
                         first_sync_tenants = []
 
-                    divided_customer_tenants = self._get_divided_customer_tenants(
-                        customer_tenants
+                    fan_out_customer_tenants = options.get(
+                        "fan_out_customer_tenants", False
                     )
+                    if fan_out_customer_tenants:
+                        # one billing account report per month is split locally
+                        divided_customer_tenants = [customer_tenants]
+                    else:
+                        divided_customer_tenants = self._get_divided_customer_tenants(
+                            options, secret_data, customer_tenants
+                        )
 
                     for divided_customer_tenant_info in divided_customer_tenants:
                         tasks.append(
@@ -103,6 +111,7 @@ class JobManager(BaseManager):
                                     "collect_scope": "customer_tenant_id",
                                     "customer_tenants": divided_customer_tenant_info,
                                     "billing_tenant_id": secret_data["tenant_id"],
+                                    "fan_out_customer_tenants": fan_out_customer_tenants,
                                 }
                             }
                         )
@@ -113,18 +122,29 @@ class JobManager(BaseManager):
                     changed.append({"start": start_month})
                     if first_sync_tenants:
                         first_sync_start_month = self._get_start_month(start=None)
-                        tasks.append(
-                            {
-                                "task_options": {
-                                    "start": first_sync_start_month,
-                                    "account_agreement_type": billing_account_agreement_type,
-                                    "collect_scope": "customer_tenant_id",
-                                    "customer_tenants": first_sync_tenants,
-                                    "billing_tenant_id": secret_data["tenant_id"],
-                                    "is_sync": False,
+                        if fan_out_customer_tenants:
+                            # a second report of the billing account would reset the
+                            # month manifests of the fan-out task, so it reads first
+                            # sync tenants from its own report
+                            self._add_first_sync_tenants(
+                                tasks[-1]["task_options"],
+                                first_sync_tenants,
+                                first_sync_start_month,
+                            )
+                        else:
+                            tasks.append(
+                                {
+                                    "task_options": {
+                                        "start": first_sync_start_month,
+                                        "account_agreement_type": billing_account_agreement_type,
+                                        "collect_scope": "customer_tenant_id",
+                                        "customer_tenants": first_sync_tenants,
+                                        "billing_tenant_id": secret_data["tenant_id"],
+                                        "fan_out_customer_tenants": fan_out_customer_tenants,
+                                        "is_sync": False,
+                                    }
                                 }
-                            }
-                        )
+                            )
                         for tenant_id in first_sync_tenants:
                             changed.append(
                                 {
@@ -178,9 +198,19 @@ class JobManager(BaseManager):
                     customer_tenants, first_sync_tenants = self._get_customer_tenants(
                         secret_data, linked_accounts
                     )
-                    divided_customer_tenants = self._get_divided_customer_tenants(
-                        customer_tenants
+                    fan_out_customer_tenants = options.get(
+                        "fan_out_customer_tenants", False
                     )
+                    if fan_out_customer_tenants:
+                        # one billing account query per month is split locally
+                        divided_customer_tenants = (
+                            [customer_tenants] if customer_tenants else []
+                        )
+                    else:
+                        divided_customer_tenants = self._get_divided_customer_tenants(
+                            options, secret_data, customer_tenants, job_type="benefit"
+                        )
+
                     for divided_customer_tenant_info in divided_customer_tenants:
                         tasks.append(
                             {
@@ -190,6 +220,7 @@ class JobManager(BaseManager):
                                     "collect_scope": "customer_tenant_id",
                                     "customer_tenants": divided_customer_tenant_info,
                                     "billing_tenant_id": secret_data["tenant_id"],
+                                    "fan_out_customer_tenants": fan_out_customer_tenants,
                                     "is_benefit_job": True,
                                 }
                             }
@@ -232,6 +263,17 @@ class JobManager(BaseManager):
         else:
             raise ERROR_INVALID_SECRET_TYPE(secret_type=options.get("secret_type"))
 
+        # an explicit start asks to collect its months again
+        if options.get("skip_unchanged_months", False) and not start:
+            skip_months = self._get_unchanged_closed_months(
+                options, secret_data, tasks, start_month
+            )
+            if skip_months:
+                _LOGGER.info(f"[get_tasks] skip unchanged closed months: {skip_months}")
+                changed = self._skip_unchanged_months(
+                    tasks, changed, start_month, skip_months
+                )
+
         _LOGGER.debug(f"[get_tasks] tasks: {tasks}")
         _LOGGER.debug(f"[get_tasks] changed: {changed}")
         _LOGGER.debug(f"[get_tasks] synced_accounts: {synced_accounts}")
@@ -277,6 +319,24 @@ class JobManager(BaseManager):
 
         return task
 
+    @staticmethod
+    def _add_first_sync_tenants(
+        task_options: dict, first_sync_tenants: list, first_sync_start_month: str
+    ) -> None:
+        tenant_start_months = {
+            tenant_id: task_options["start"]
+            for tenant_id in task_options["customer_tenants"]
+        }
+        tenant_start_months.update(
+            {tenant_id: first_sync_start_month for tenant_id in first_sync_tenants}
+        )
+
+        task_options["start"] = min(task_options["start"], first_sync_start_month)
+        task_options["customer_tenants"] = (
+            task_options["customer_tenants"] + first_sync_tenants
+        )
+        task_options["tenant_start_months"] = tenant_start_months
+
     def _get_tenants_from_billing_account(self):
         tenants = []
         for (
@@ -285,6 +345,202 @@ class JobManager(BaseManager):
             tenants.append(billing_account["customer_id"])
         return tenants
 
+    def _get_unchanged_closed_months(
+        self, options: dict, secret_data: dict, tasks: list, start_month: str
+    ) -> list:
+        scopes = set()
+        report_scopes = set()
+        for task in tasks:
+            task_options = task["task_options"]
+            if task_options.get("tenant_start_months"):
+                # a fan-out task with first sync tenants sends every month of its
+                # report, so no month of the run is left unchanged
+                return []
+
+            if task_options.get("is_sync") is False:
+                continue
+
+            task_scopes = self._get_task_scopes(secret_data, task_options)
+            # benefit rows are billed with the cost rows of their scope, so the
+            # cost report of the scope re-validates them too
+            report_scopes.update(task_scopes)
+            if task_options.get("is_benefit_job"):
+                # benefit tasks resend the month too, so their rows must be unchanged
+                task_scopes = [
+                    BENEFIT_MANIFEST_SCOPE.format(scope=scope) for scope in task_scopes
+                ]
+            scopes.update(task_scopes)
+
+        if not scopes:
+            return []
+
+        self.local_state_connector.create_session(options)
+        scopes.update(report_scopes)
+
+        unchanged_months = []
+        for month in self._get_closed_months(start_month):
+            if self._is_unchanged_month(scopes, report_scopes, month, options):
+                unchanged_months.append(month)
+
+        if not unchanged_months:
+            return []
+
+        return self._get_unchanged_report_months(
+            report_scopes, unchanged_months, options
+        )
+
+    def _is_unchanged_month(
+        self, scopes: set, report_scopes: set, month: str, options: dict
+    ) -> bool:
+        """A month is unchanged when its last two collections were the same and the
+        last one is younger than skip_revalidation_days"""
+
+        revalidated_after = (
+            datetime.utcnow()
+            - timedelta(
+                days=options.get("skip_revalidation_days", SKIP_REVALIDATION_DAYS)
+            )
+        ).isoformat()
+
+        for scope in scopes:
+            month_manifest = self.local_state_connector.get_month_manifest(scope, month)
+            if (
+                not month_manifest
+                or month_manifest["unchanged_count"] == 0
+                or month_manifest["updated_at"] < revalidated_after
+            ):
+                return False
+
+            # manifests of older versions have no report windows to generate again
+            if scope in report_scopes and month_manifest["window_days"] is None:
+                return False
+        return True
+
+    def _get_unchanged_report_months(
+        self, report_scopes: set, months: list, options: dict
+    ) -> list:
+        """Generate the reports of the months again and keep the months whose blobs
+        have the sizes of their last collection. Reports are only generated, their
+        blobs are not downloaded."""
+
+        report_months = [(scope, month) for month in months for scope in report_scopes]
+        with ThreadPoolExecutor(max_workers=REPORT_WORKER_SIZE) as executor:
+            unchanged_reports = executor.map(
+                lambda report_month: self._is_unchanged_report(*report_month, options),
+                report_months,
+            )
+            changed_months = {
+                month
+                for (_, month), is_unchanged in zip(report_months, unchanged_reports)
+                if not is_unchanged
+            }
+
+        return [month for month in months if month not in changed_months]
+
+    def _is_unchanged_report(self, scope: str, month: str, options: dict) -> bool:
+        month_manifest = self.local_state_connector.get_month_manifest(scope, month)
+        start = CostManager._get_first_date_of_month(month)
+        end = CostManager._get_last_date_of_month(start.year, start.month)
+
+        blob_sizes = []
+        try:
+            for time_window in CostManager._make_report_time_windows(
+                start, end, month_manifest["window_days"]
+            ):
+                parameters = CostManager._make_parameters(
+                    time_window["start"], time_window["end"], options
+                )
+                blobs = self.azure_cm_connector.begin_create_operation(
+                    scope, parameters
+                )
+                blob_sizes.extend(blob.get("byte_count") or 0 for blob in blobs)
+        except Exception as e:
+            _LOGGER.warning(
+                f"[get_tasks] {scope} {month} report is not re-validated, collect it again: {e}"
+            )
+            return False
+
+        if sorted(blob_sizes) != sorted(json.loads(month_manifest["blob_sizes"])):
+            _LOGGER.info(
+                f"[get_tasks] {scope} {month} report changed since its last collection"
+            )
+            return False
+        return True
+
+    @staticmethod
+    def _get_closed_months(start_month: str) -> list:
+        closed_months = []
+        month = datetime.strptime(start_month, "%Y-%m")
+        closed_before = datetime.utcnow() - timedelta(days=CLOSED_MONTH_DELAY_DAYS)
+
+        while month + relativedelta(months=1) <= closed_before:
+            closed_months.append(month.strftime("%Y-%m"))
+            month += relativedelta(months=1)
+        return closed_months
+
+    @staticmethod
+    def _get_task_scopes(secret_data: dict, task_options: dict) -> list:
+        collect_scope = task_options["collect_scope"]
+        billing_account_id = secret_data.get("billing_account_id")
+
+        if collect_scope == "subscription_id":
+            return [
+                SCOPE_MAP[collect_scope].format(
+                    subscription_id=task_options["subscription_id"]
+                )
+            ]
+        elif collect_scope == "customer_tenant_id" and not task_options.get(
+            "fan_out_customer_tenants"
+        ):
+            return [
+                SCOPE_MAP[collect_scope].format(
+                    billing_account_id=billing_account_id,
+                    customer_tenant_id=customer_tenant_id,
+                )
+                for customer_tenant_id in task_options["customer_tenants"]
+            ]
+        else:
+            return [
+                SCOPE_MAP["billing_account_id"].format(
+                    billing_account_id=billing_account_id
+                )
+            ]
+
+    @staticmethod
+    def _skip_unchanged_months(
+        tasks: list, changed: list, start_month: str, skip_months: list
+    ) -> list:
+        for task in tasks:
+            task_options = task["task_options"]
+            if task_options.get("is_sync") is not False:
+                task_options["skip_months"] = skip_months
+
+        # changed months are kept as [start, end] ranges around the skipped months
+        changed_months = []
+        range_start = None
+        previous_month = None
+        month = datetime.strptime(start_month, "%Y-%m")
+        current_month = datetime.utcnow().strftime("%Y-%m")
+
+        while month.strftime("%Y-%m") <= current_month:
+            _month = month.strftime("%Y-%m")
+            if _month in skip_months:
+                if range_start:
+                    changed_months.append({"start": range_start, "end": previous_month})
+                    range_start = None
+            elif not range_start:
+                range_start = _month
+
+            previous_month = _month
+            month += relativedelta(months=1)
+
+        if range_start:
+            changed_months.append({"start": range_start})
+
+        return changed_months + [
+            changed_info for changed_info in changed if changed_info.get("filter")
+        ]
+
     def _get_start_month(
         self, start: Union[str, None], last_synchronized_at: datetime = None
     ) -> str:
@@ -307,9 +563,10 @@ class JobManager(BaseManager):
         self, secret_data: dict, linked_accounts: list = None
     ) -> Tuple[list, list]:
         first_sync_customer_tenants = []
-        customer_tenants: list = secret_data.get(
-            "customer_tenants", self._get_tenants_from_billing_account()
-        )
+        if "customer_tenants" in secret_data:
+            customer_tenants: list = secret_data["customer_tenants"]
+        else:
+            customer_tenants: list = self._get_tenants_from_billing_account()
         if len(customer_tenants) == 0:
             raise ERROR_EMPTY_CUSTOMER_TENANTS(customer_tenants=customer_tenants)
 
@@ -341,15 +598,150 @@ class JobManager(BaseManager):
         )
         return synced_accounts
 
-    @staticmethod
-    def _get_divided_customer_tenants(customer_tenants_info: list) -> list:
-        tenant_size = math.ceil(len(customer_tenants_info) / _TASK_LIST_SIZE)
+    def _get_divided_customer_tenants(
+        self,
+        options: dict,
+        secret_data: dict,
+        customer_tenants_info: list,
+        job_type: str = "cost",
+    ) -> list:
+        task_shard_count = max(options.get("task_shard_count", _TASK_LIST_SIZE), 1)
+
+        if options.get("balance_tasks_by_volume", False):
+            tenant_weights = self._get_tenant_weights(
+                options, customer_tenants_info, job_type
+            )
+            return self._balance_by_weight(
+                customer_tenants_info,
+                [tenant_weights[tenant_id] for tenant_id in customer_tenants_info],
+                task_shard_count,
+            )
+
+        tenant_size = math.ceil(len(customer_tenants_info) / task_shard_count)
         divided_customer_tenants_info = [
             customer_tenants_info[idx : idx + tenant_size]
             for idx in range(0, len(customer_tenants_info), tenant_size)
         ]
         return divided_customer_tenants_info
 
+    def _get_divided_months(
+        self, options: dict, secret_data: dict, start_month: str
+    ) -> list:
+        task_shard_count = max(options.get("task_shard_count", _TASK_LIST_SIZE), 1)
+        start = datetime.strptime(start_month, "%Y-%m")
+        end = datetime.utcnow()
+
+        month_delta = relativedelta(end, start)
+        months = [
+            datetime.strftime(start + relativedelta(months=month), "%Y-%m")
+            for month in range(month_delta.years * 12 + month_delta.months + 1)
+        ]
+
+        if options.get("balance_tasks_by_volume", False):
+            month_weights = self._get_month_weights(
+                options, secret_data["tenant_id"], months
+            )
+            weights = [month_weights[month] for month in months]
+            month_ranges = self._partition_by_weight(weights, task_shard_count)
+
+            # the heaviest tasks are started first
+            month_ranges.sort(
+                key=lambda month_range: -sum(
+                    weights[month_range[0] : month_range[1] + 1]
+                )
+            )
+        else:
+            month_range_step = math.ceil(len(months) / task_shard_count)
+            month_ranges = [
+                (idx, min(idx + month_range_step, len(months)) - 1)
+                for idx in range(0, len(months), month_range_step)
+            ]
+
+        return [
+            (months[start_idx], months[end_idx]) for start_idx, end_idx in month_ranges
+        ]
+
+    def _get_tenant_weights(self, options: dict, tenants: list, job_type: str) -> dict:
+        """Estimated collection cost of each tenant: average duration per month"""
+
+        self.local_state_connector.create_session(options)
+        tenant_durations = {}
+        for collection_stats in self.local_state_connector.list_collection_stats(
+            tenants, job_type
+        ):
+            tenant_durations.setdefault(collection_stats["tenant"], []).append(
+                collection_stats["duration"]
+            )
+
+        tenant_weights = {
+            tenant: sum(durations) / len(durations)
+            for tenant, durations in tenant_durations.items()
+        }
+        return self._fill_unknown_weights(tenants, tenant_weights)
+
+    def _get_month_weights(self, options: dict, tenant: str, months: list) -> dict:
+        self.local_state_connector.create_session(options)
+        month_weights = {
+            collection_stats["month"]: collection_stats["duration"]
+            for collection_stats in self.local_state_connector.list_collection_stats(
+                [tenant], "cost"
+            )
+            if collection_stats["month"] in months
+        }
+        return self._fill_unknown_weights(months, month_weights)
+
+    @staticmethod
+    def _fill_unknown_weights(keys: list, weights: dict) -> dict:
+        # keys without history are weighted as the median of the known ones
+        known_weights = sorted(weight for weight in weights.values() if weight > 0)
+        default_weight = known_weights[len(known_weights) // 2] if known_weights else 1
+
+        return {
+            key: weights[key] if weights.get(key, 0) > 0 else default_weight
+            for key in keys
+        }
+
+    @staticmethod
+    def _balance_by_weight(items: list, weights: list, shard_count: int) -> list:
+        """Assign the heaviest remaining item to the lightest shard"""
+
+        shard_count = max(min(shard_count, len(items)), 1)
+        shards = [[] for _ in range(shard_count)]
+        shard_loads = [0] * shard_count
+
+        for item, weight in sorted(zip(items, weights), key=lambda x: -x[1]):
+            shard_idx = shard_loads.index(min(shard_loads))
+            shards[shard_idx].append(item)
+            shard_loads[shard_idx] += weight
+
+        # the heaviest tasks are started first
+        shards = [
+            shard for _, shard in sorted(zip(shard_loads, shards), key=lambda x: -x[0])
+        ]
+        return [shard for shard in shards if shard]
+
+    @staticmethod
+    def _partition_by_weight(weights: list, shard_count: int) -> list:
+        """Split into contiguous (start_idx, end_idx) ranges of similar weight"""
+
+        target_weight = sum(weights) / max(shard_count, 1)
+        ranges = []
+        range_start = 0
+        cumulative_weight = 0
+
+        for idx, weight in enumerate(weights):
+            cumulative_weight += weight
+            if len(ranges) < shard_count - 1 and cumulative_weight >= target_weight * (
+                len(ranges) + 1
+            ):
+                ranges.append((range_start, idx))
+                range_start = idx + 1
+
+        if range_start < len(weights):
+            ranges.append((range_start, len(weights) - 1))
+
+        return ranges
+
     @staticmethod
     def _parse_start_time(start_time: str) -> datetime:
         date_format = "%Y-%m"
@@ -0,0 +1,6 @@
+from cloudforet.cost_analysis.model.cost_record import (
+    Record,
+    CostRecord,
+    CostDataRecord,
+    AdditionalInfoRecord,
+)
@@ -0,0 +1,163 @@
+from operator import itemgetter
+from typing import Any
+
+__all__ = ["Record", "CostRecord", "CostDataRecord", "AdditionalInfoRecord"]
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __reduce__(self):
+        # pickled by name, so a record sent from a worker process keeps its gaps
+        return "_MISSING"
+
+
+_MISSING = _Missing()
+
+
+class Record(tuple):
+    """Fixed-schema row stored as a tuple of values in the order of its keys.
+
+    A record is built once from the dict of a transformed row, read with the
+    same keys and built back into a dict only when it is sent.
+    """
+
+    __slots__ = ()
+    _keys = ()
+    _index = {}
+    _missing_fields = {}
+
+    def __new__(cls, fields: dict):
+        # every key of the schema is filled, so any extra key makes the dict longer
+        fields = {**cls._missing_fields, **fields}
+        if len(fields) != len(cls._keys):
+            raise KeyError(f"{cls.__name__} has no {fields.keys() - cls._index.keys()}")
+        return tuple.__new__(cls, cls._get_values(fields))
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._index = {key: idx for idx, key in enumerate(cls._keys)}
+        cls._missing_fields = dict.fromkeys(cls._keys, _MISSING)
+        # itemgetter returns a tuple of the values only for two or more keys
+        cls._get_values = staticmethod(
+            itemgetter(*cls._keys)
+            if len(cls._keys) > 1
+            else lambda fields: tuple(fields.values())
+        )
+
+    def __reduce__(self):
+        # __new__ takes a dict, so a pickled or copied record is rebuilt from its values
+        return tuple.__new__, (type(self), tuple(self))
+
+    def __getitem__(self, key: str) -> Any:
+        value = tuple.__getitem__(self, self._index[key])
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        idx = self._index.get(key)
+        if idx is None:
+            return default
+        value = tuple.__getitem__(self, idx)
+        return default if value is _MISSING else value
+
+    def items(self) -> list:
+        return [
+            (key, value)
+            for key, value in zip(self._keys, self)
+            if value is not _MISSING
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            key: value for key, value in zip(self._keys, self) if value is not _MISSING
+        }
+
+
+class CostDataRecord(Record):
+    __slots__ = ()
+    _keys = ("Actual Cost", "Amortized Cost", "Saved Cost")
+
+
+class AdditionalInfoRecord(Record):
+    __slots__ = ()
+    _keys = (
+        "Tenant Id",
+        "Subscription Id",
+        "Instance Type",
+        "Resource Group",
+        "Subscription Name",
+        "Pricing Model",
+        "Reservation Name",
+        "Reservation Id",
+        "Benefit Name",
+        "Benefit Id",
+        "Meter SubCategory",
+        "Meter Id",
+        "Department Name",
+        "Enrollment Account Name",
+        "Charge Type",
+        "Resource Id",
+        "Resource Name",
+        "Product Name",
+        "Product Id",
+        "Customer Name",
+        "Service Family",
+        "Meter Name",
+        "Consumed Service",
+        "Term",
+        "RI Normalization Ratio",
+        "PayG Unit Price",
+        "Billing Tenant Id",
+        "Usage Type Details",
+    )
+
+
+class CostRecord(Record):
+    __slots__ = ()
+    _keys = (
+        "cost",
+        "usage_quantity",
+        "usage_type",
+        "usage_unit",
+        "provider",
+        "region_code",
+        "product",
+        "tags",
+        "billed_date",
+        "data",
+        "additional_info",
+    )
+
+    _record_types = {"data": CostDataRecord, "additional_info": AdditionalInfoRecord}
+
+    def to_dict(self) -> dict:
+        cost_data = super().to_dict()
+        for key in self._record_types:
+            if key in cost_data:
+                cost_data[key] = cost_data[key].to_dict()
+        return cost_data
+
+    def to_values(self) -> tuple:
+        """Values with the nested records as plain tuples, a tuple of builtin types
+        is pickled several times faster than records when it is sent to a process"""
+
+        values = list(self)
+        for key in self._record_types:
+            idx = self._index[key]
+            if values[idx] is not _MISSING:
+                values[idx] = tuple(values[idx])
+        return tuple(values)
+
+    @classmethod
+    def from_values(cls, values: tuple) -> "CostRecord":
+        values = list(values)
+        for key, record_type in cls._record_types.items():
+            idx = cls._index[key]
+            if values[idx] is not _MISSING:
+                values[idx] = tuple.__new__(record_type, values[idx])
+        return tuple.__new__(cls, values)
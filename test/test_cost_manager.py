@@ -0,0 +1,213 @@
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from unittest import mock
+
+from cloudforet.cost_analysis.connector.azure_cost_mgmt_connector import (
+    AzureCostMgmtConnector,
+)
+from cloudforet.cost_analysis.connector.local_state_connector import (
+    LocalStateConnector,
+)
+from cloudforet.cost_analysis.manager.cost_manager import CostManager
+
+SCOPE = "providers/Microsoft.Billing/billingAccounts/test"
+TASK_OPTIONS = {"collect_scope": "billing_account_id", "start": "2024-01"}
+DOMAIN_ID = "domain-test"
+START = datetime(2024, 1, 1)
+END = datetime(2024, 1, 31)
+
+BLOB_ROWS = 12000
+COLUMNS = [
+    "Date",
+    "CostInBillingCurrency",
+    "PayGCostInBillingCurrency",
+    "Quantity",
+    "MeterCategory",
+    "MeterName",
+    "MeterId",
+    "ResourceLocation",
+    "ResourceGroup",
+    "ResourceId",
+    "SubscriptionId",
+    "SubscriptionName",
+    "ChargeType",
+    "PricingModel",
+    "ProductName",
+    "ConsumedService",
+    "UnitOfMeasure",
+    "Tags",
+    "BillingCurrency",
+]
+
+SERIAL_OPTIONS = {"cost_metric": "ActualCost"}
+PARALLEL_OPTIONS = {
+    "cost_metric": "ActualCost",
+    "parse_worker_size": 2,
+    "parse_range_bytes": 64 * 1024,
+}
+
+
+def _make_blob_csv(blob_index: int) -> bytes:
+    # every row has its own cost, so sent rows are told apart by their costs
+    lines = [",".join(COLUMNS)]
+    for row_index in range(BLOB_ROWS):
+        cost = blob_index * BLOB_ROWS + row_index + 1
+        lines.append(
+            ",".join(
+                [
+                    f"01/{row_index % 28 + 1:02d}/2024",
+                    str(cost),
+                    str(cost),
+                    "1",
+                    "Virtual Machines",
+                    f"D{row_index % 7} v3",
+                    f"meter-{row_index % 50}",
+                    "EU West",
+                    f"rg-{row_index % 20}",
+                    f"/subscriptions/sub-{row_index % 10}/resourceGroups/rg-{row_index % 20}/providers/vm-{row_index % 300}",
+                    f"sub-{row_index % 10}",
+                    f"Subscription {row_index % 10}",
+                    "Usage",
+                    "OnDemand",
+                    "Virtual Machines Dv3 Series",
+                    "Microsoft.Compute",
+                    "1 Hour",
+                    '"{""env"": ""prod""}"',
+                    "USD",
+                ]
+            )
+        )
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+class TestCheckpointResume(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.blob_csvs = {f"blob-{idx}": _make_blob_csv(idx) for idx in range(2)}
+        cls.blobs = [
+            {"blob_link": blob_link, "byte_count": len(blob_csv)}
+            for blob_link, blob_csv in cls.blob_csvs.items()
+        ]
+        cls.all_costs = list(range(1, len(cls.blobs) * BLOB_ROWS + 1))
+
+    def setUp(self):
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.state_dir = state_dir.name
+
+        blob_csvs = self.blob_csvs
+
+        def _download_cost_data(connector, blob, temp_file, options):
+            temp_file.write(blob_csvs[blob["blob_link"]])
+            temp_file.seek(0)
+
+        for name, fake in [
+            ("_download_cost_data", _download_cost_data),
+            ("begin_create_operation", lambda connector, scope, params: self.blobs),
+        ]:
+            patcher = mock.patch.object(AzureCostMgmtConnector, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _make_manager(self, options: dict) -> CostManager:
+        manager = CostManager._make_transform_manager()
+        manager.local_state_connector = LocalStateConnector()
+        manager.report_daily_rows = {}
+        manager.checkpoint_task_key = None
+        manager.checkpoint_interval = 1
+        manager.checkpoints = {}
+        manager.parse_executor = None
+        manager._init_checkpoint(
+            {**options, "state_dir": self.state_dir}, TASK_OPTIONS, DOMAIN_ID
+        )
+        return manager
+
+    def _get_costs(self, options: dict, sent_chunks: int = None) -> list:
+        """Collect the scope and return the costs of the sent rows. With sent_chunks
+        the run is interrupted while the chunk after them is sent."""
+
+        manager = self._make_manager(options)
+        costs = []
+        with manager._open_parse_executor(options):
+            response_stream = manager._get_scope_cost_data(
+                SCOPE, START, END, options, "EnterpriseAgreement", "billing-tenant"
+            )
+            for chunk_index, costs_data in enumerate(response_stream):
+                if chunk_index == sent_chunks:
+                    response_stream.close()
+                    break
+                costs.extend(cost_data["cost"] for cost_data in costs_data)
+
+        self.assertIsNone(manager.parse_executor)
+        return costs
+
+    def _assert_resumed_once(
+        self, interrupted_options: dict, sent_chunks: int, resumed_options: dict
+    ) -> None:
+        sent_costs = self._get_costs(
+            {**interrupted_options, "save_checkpoint": True}, sent_chunks
+        )
+        self.assertTrue(0 < len(sent_costs) < len(self.all_costs))
+
+        resumed_costs = self._get_costs(
+            {**resumed_options, "resume_from_checkpoint": True}
+        )
+        self.assertEqual(sorted(sent_costs + resumed_costs), self.all_costs)
+
+    def test_parse_workers_are_shared_by_blobs(self):
+        with mock.patch(
+            "cloudforet.cost_analysis.manager.cost_manager.ProcessPoolExecutor",
+            wraps=ProcessPoolExecutor,
+        ) as executor_class:
+            costs = self._get_costs(PARALLEL_OPTIONS)
+
+        self.assertEqual(sorted(costs), self.all_costs)
+        executor_class.assert_called_once()
+
+    def test_resume_without_parse_options_change(self):
+        self._assert_resumed_once(SERIAL_OPTIONS, 3, SERIAL_OPTIONS)
+
+    def test_resume_with_parse_workers_after_single_reader(self):
+        # single reader chunks have 5000 rows, the resumed blob is split into ranges
+        self._assert_resumed_once(SERIAL_OPTIONS, 2, PARALLEL_OPTIONS)
+
+    def test_resume_with_single_reader_after_parse_workers(self):
+        # a chunk of a byte range has far fewer rows than a single reader chunk
+        self._assert_resumed_once(PARALLEL_OPTIONS, 7, SERIAL_OPTIONS)
+
+    def test_resume_does_not_read_sent_blobs(self):
+        # the first blob has three chunks, the run is interrupted in the second blob
+        sent_costs = self._get_costs({**SERIAL_OPTIONS, "save_checkpoint": True}, 4)
+
+        open_blob_file = AzureCostMgmtConnector.open_blob_file
+        opened_blobs = []
+
+        def _open_blob_file(connector, blob, options):
+            opened_blobs.append(blob["blob_link"])
+            return open_blob_file(connector, blob, options)
+
+        with mock.patch.object(
+            AzureCostMgmtConnector, "open_blob_file", _open_blob_file
+        ), mock.patch.object(
+            CostManager, "_set_report_daily_rows", autospec=True
+        ) as set_report_daily_rows:
+            resumed_costs = self._get_costs(
+                {**SERIAL_OPTIONS, "resume_from_checkpoint": True}
+            )
+
+        self.assertEqual(opened_blobs, ["blob-1"])
+        self.assertEqual(sorted(sent_costs + resumed_costs), self.all_costs)
+        set_report_daily_rows.assert_called_once_with(
+            mock.ANY, SCOPE, START, END, len(self.all_costs)
+        )
+
+    def test_resume_with_other_parse_range_bytes(self):
+        self._assert_resumed_once(
+            PARALLEL_OPTIONS, 5, {**PARALLEL_OPTIONS, "parse_range_bytes": 200 * 1024}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
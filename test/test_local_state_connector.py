@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from cloudforet.cost_analysis.connector.local_state_connector import (
+    LocalStateConnector,
+)
+
+
+class TestBlobCachePin(unittest.TestCase):
+    def setUp(self):
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.options = {"state_dir": state_dir.name}
+
+        # connectors of two tasks share the state file like two processes do
+        self.reader = LocalStateConnector()
+        self.reader.create_session(self.options)
+        self.writer = LocalStateConnector()
+        self.writer.create_session(self.options)
+
+    def _save_cached_blob(self, cache_key: str, content: bytes) -> dict:
+        with self.writer.create_blob_cache_file() as blob_file:
+            blob_file.write(content)
+            blob_file.flush()
+            return self.writer.save_cached_blob(cache_key, 0, blob_file.name)
+
+    def test_pinned_report_is_not_evicted_by_other_task(self):
+        self._save_cached_blob("report-a", b"a" * 100)
+        pin_id = self.reader.pin_cached_blobs(["report-a"], 60)
+        cached_blobs = self.reader.get_cached_blobs("report-a")
+
+        self._save_cached_blob("report-b", b"b" * 100)
+        self.writer.evict_blob_cache(0)
+
+        self.assertTrue(os.path.exists(cached_blobs[0]["blob_path"]))
+        self.assertEqual(self.writer.get_cached_blobs("report-b"), [])
+
+        self.reader.unpin_cached_blobs(pin_id)
+        self.writer.evict_blob_cache(0)
+
+        self.assertFalse(os.path.exists(cached_blobs[0]["blob_path"]))
+        self.assertEqual(self.reader.get_cached_blobs("report-a"), [])
+
+    def test_expired_pin_is_ignored(self):
+        cached_blob = self._save_cached_blob("report-a", b"a" * 100)
+        self.reader.pin_cached_blobs(["report-a"], -1)
+
+        self.writer.evict_blob_cache(0)
+
+        self.assertFalse(os.path.exists(cached_blob["blob_path"]))
+
+    def test_shared_blob_file_is_kept_for_other_report(self):
+        cached_blob = self._save_cached_blob("report-a", b"a" * 100)
+        pin_id = self.reader.pin_cached_blobs(["report-b"], 60)
+        self._save_cached_blob("report-b", b"a" * 100)
+
+        self.writer.evict_blob_cache(100)
+
+        self.assertEqual(self.writer.get_cached_blobs("report-a"), [])
+        self.assertEqual(self.reader.get_cached_blobs("report-b"), [cached_blob])
+        self.reader.unpin_cached_blobs(pin_id)
+
+
+if __name__ == "__main__":
+    unittest.main()